@@ -0,0 +1,359 @@
+# --- GEMINI ANALİZİ ---
+# Kısa transkriptler tek istekte analiz edilir. Uzun derslerde metin örtüşen
+# pencerelere bölünür (map), pencereler eşzamanlı analiz edilir ve çıkan
+# konular birleştirilip tekrarlar ayıklanır (reduce).
+# Transkript parçaları verilirse pencereler parçalardan içerik tanımlı olarak
+# kurulur ve pencere sonuçları önbelleğe yazılır; ders yeniden kesilip
+# yüklendiğinde metni değişmeyen pencerelerin konuları aynen geri gelir.
+import json
+import re
+import time
+import difflib
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import make_key
+from metrics import instrument, observe
+
+PRIMARY_MODEL = "gemini-2.5-flash"
+FALLBACK_MODEL = "gemini-2.0-flash"
+
+# Model sağlığı (devre kesici) ayarları
+FAILURE_THRESHOLD = 2          # Üst üste bu kadar hata alan model devreden çıkar
+COOLDOWN_S = 300               # Devreden çıkan model bu süre sonra tekrar denenir
+
+# Map-reduce ayarları (karakter cinsinden)
+MAP_REDUCE_MIN_CHARS = 12000   # Bundan kısa metinler tek istekte gider
+WINDOW_CHARS = 8000
+OVERLAP_CHARS = 800
+MAX_CONCURRENCY = 4            # Aynı anda Gemini'ye giden en fazla istek
+CHUNK_RETRIES = 2              # Bozuk JSON dönen pencere kendi başına tekrar denenir
+TITLE_SIMILARITY = 0.85        # Bu orandan benzer başlıklar aynı konu sayılır
+WINDOW_SEGMENTS = 4            # Parça pencerelerinde ortalama parça sayısı (~4 dk konuşma)
+
+
+# --- MODEL SEÇİCİ ---
+class ModelSelector:
+    """
+    Süreç genelinde hangi modelin sağlıklı olduğunu hatırlar.
+    Deneme ("test") isteği atılmaz; asıl istek hata verirse sıradaki modele geçilir.
+    Üst üste FAILURE_THRESHOLD hata alan model COOLDOWN_S boyunca atlanır,
+    süre dolunca tek bir istekle yeniden denenir (yarı açık devre); deneme
+    sürerken gelen eşzamanlı istekler (ör. map-reduce pencereleri) o modeli atlar.
+    """
+
+    def __init__(self, model_names, failure_threshold=FAILURE_THRESHOLD, cooldown_s=COOLDOWN_S):
+        self.model_names = list(model_names)
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self._lock = threading.Lock()
+        self._api_key = None
+        self._models = {}
+        self._failures = {name: 0 for name in self.model_names}
+        self._open_until = {name: 0.0 for name in self.model_names}
+        self._probing = set()       # Yarı açık devrede denemesi süren modeller
+        self._stats = {
+            name: {'secim': 0, 'hata': 0, 'sureler': deque(maxlen=200)}
+            for name in self.model_names
+        }
+
+    def configure(self, api_key):
+        # google.generativeai ağır bir import; ilk analiz isteğine kadar yüklenmez
+        self._api_key = api_key
+
+    def _get_model(self, name):
+        with self._lock:
+            if name not in self._models:
+                import google.generativeai as genai
+                if not self._models and self._api_key:
+                    genai.configure(api_key=self._api_key)
+                self._models[name] = genai.GenerativeModel(name)
+            return self._models[name]
+
+    def _candidates(self):
+        # Süresi dolan model tekrar listeye girer. Hata sayacı sıfırlanmadığı için
+        # bu denemede de hata verirse hemen yeniden devreden çıkar.
+        now = time.time()
+        with self._lock:
+            names = [name for name in self.model_names if self._open_until[name] <= now]
+        # Hepsi devre dışıysa yine de sırayla dene
+        return names or list(self.model_names)
+
+    def _acquire(self, name):
+        # Süresi dolmuş (yarı açık) modele aynı anda yalnızca tek deneme isteği gider
+        with self._lock:
+            half_open = self._failures[name] >= self.failure_threshold and self._open_until[name] <= time.time()
+            if not half_open:
+                return True
+            if name in self._probing:
+                return False
+            self._probing.add(name)
+            return True
+
+    def _record(self, name, ok, duration):
+        with self._lock:
+            self._probing.discard(name)
+            stats = self._stats[name]
+            stats['secim'] += 1
+            stats['sureler'].append(duration)
+            if ok:
+                self._failures[name] = 0
+                self._open_until[name] = 0.0
+                return
+            stats['hata'] += 1
+            self._failures[name] += 1
+            if self._failures[name] >= self.failure_threshold:
+                self._open_until[name] = time.time() + self.cooldown_s
+
+    def generate(self, prompt):
+        """İsteği sağlıklı ilk modele gönderir. Geriye (yanıt, model_adı) döner."""
+        last_error = None
+        for name in self._candidates():
+            if not self._acquire(name):
+                continue
+            start = time.perf_counter()
+            try:
+                response = self._get_model(name).generate_content(prompt)
+            except Exception as e:
+                self._record(name, False, time.perf_counter() - start)
+                last_error = e
+                continue
+            self._record(name, True, time.perf_counter() - start)
+            usage = getattr(response, 'usage_metadata', None)
+            if usage is not None:
+                observe("gemini_istek", 'tokens', getattr(usage, 'total_token_count', 0) or 0)
+            return response, name
+        raise last_error or RuntimeError("Sağlıklı model yok; yeniden deneme sürüyor.")
+
+    def stats(self):
+        """Model başına seçim sayısı, hata sayısı ve çağrı süreleri (sn)."""
+        now = time.time()
+        with self._lock:
+            out = []
+            for name in self.model_names:
+                s = self._stats[name]
+                sureler = sorted(s['sureler'])
+                out.append({
+                    'Model': name,
+                    'Seçim': s['secim'],
+                    'Hata': s['hata'],
+                    'Ort. Süre (sn)': round(sum(sureler) / len(sureler), 2) if sureler else None,
+                    'p95 Süre (sn)': round(sureler[min(len(sureler) - 1, int(len(sureler) * 0.95))], 2) if sureler else None,
+                    'Durum': 'Devre dışı' if self._open_until[name] > now else 'Sağlıklı',
+                })
+            return out
+
+
+model_selector = ModelSelector([PRIMARY_MODEL, FALLBACK_MODEL])
+
+
+def build_prompt(full_text, part=None):
+    bolum = ""
+    if part:
+        i, n = part
+        bolum = f"\n    NOT: Bu metin uzun bir dersin {i}/{n}. bölümüdür. Yalnızca bu bölümde işlenen konuları çıkar.\n"
+    return f"""
+    Sen uzman bir eğitim asistanısın. Video transkriptini analiz et.
+    {bolum}
+    GÖREVLER:
+    1. Konuyu alt başlıklara böl.
+    2. Her başlık için video içeriğinden bir ÖZET çıkar.
+    3. [KRİTİK] Her başlık için, videoda geçmese bile, o konuyu akademik olarak destekleyen EK BİLGİ (Extra Resource) ekle.
+    4. Her başlık için bir test sorusu yaz.
+
+    Çıktı JSON Formatı:
+    [
+      {{
+        "alt_baslik": "Konu Başlığı",
+        "ozet": "Video özeti...",
+        "ek_bilgi": "Akademik ve teknik detay bilgi...",
+        "soru_data": {{
+            "soru": "Soru?",
+            "A": "...", "B": "...", "C": "...", "D": "...",
+            "dogru_sik": "A"
+        }}
+      }}
+    ]
+    METİN: "{full_text}"
+    """
+
+
+def parse_response(text):
+    """Model çıktısındaki JSON listesini ayıklar. Geçersizse ValueError fırlatır."""
+    text = text.replace("```json", "").replace("```", "").strip()
+    start = text.find('[')
+    end = text.rfind(']') + 1
+    if start == -1 or end <= start:
+        raise ValueError("Yanıtta JSON listesi bulunamadı.")
+    data = json.loads(text[start:end])
+    if not isinstance(data, list):
+        raise ValueError("Yanıt bir liste değil.")
+    return [item for item in data if isinstance(item, dict) and item.get('alt_baslik')]
+
+
+# --- MAP: METNİ PENCERELERE BÖL ---
+_SENTENCE_END = re.compile(r'[.!?…]\s+')
+
+
+def split_windows(full_text, size=WINDOW_CHARS, overlap=OVERLAP_CHARS):
+    """Metni cümle sınırlarından kesilen, birbiriyle örtüşen pencerelere böler."""
+    n = len(full_text)
+    if n <= size:
+        return [full_text]
+
+    windows = []
+    start = 0
+    while start < n:
+        end = min(n, start + size)
+        if end < n:
+            # Pencere sonunu son cümle bitişine çek
+            ends = [m.end() for m in _SENTENCE_END.finditer(full_text, start + size // 2, end)]
+            if ends:
+                end = ends[-1]
+        windows.append(full_text[start:end].strip())
+        if end >= n:
+            break
+        # Bir sonraki pencere, örtüşme payının içindeki ilk cümle başından başlar
+        next_start = max(start + 1, end - overlap)
+        m = _SENTENCE_END.search(full_text, next_start, end)
+        start = m.end() if m else next_start
+    return windows
+
+
+def group_segments(texts, every=WINDOW_SEGMENTS, max_chars=2 * WINDOW_CHARS):
+    """
+    Transkript parçalarını pencerelere toplar. Pencere sınırı, parçanın kendi
+    metninin hash'ine göre konur (ortalama her `every` parçada bir); böylece bir
+    parçadaki değişiklik yalnızca kendi penceresini değiştirir, diğer
+    pencerelerin metni birebir aynı kalır. Pencereler örtüşmez; kesimler zaten
+    konuşmadaki duraklamalara denk gelir.
+    """
+    windows, current, size = [], [], 0
+    for text in texts:
+        if not text:
+            continue
+        if current and size + len(text) > max_chars:
+            windows.append(current)
+            current, size = [], 0
+        current.append(text)
+        size += len(text) + 1
+        if int(hashlib.sha256(text.encode('utf-8')).hexdigest()[:8], 16) % every == 0:
+            windows.append(current)
+            current, size = [], 0
+    if current:
+        windows.append(current)
+    return [" ".join(w) for w in windows]
+
+
+def _analyze_window(window, part):
+    last_error = None
+    for attempt in range(CHUNK_RETRIES + 1):
+        try:
+            response, model_name = model_selector.generate(build_prompt(window, part))
+            items = parse_response(response.text)
+            observe("gemini_pencere", 'retries', attempt)
+            return items, model_name, None
+        except Exception as e:
+            last_error = e
+            if attempt < CHUNK_RETRIES:
+                time.sleep(2 ** attempt)
+    observe("gemini_pencere", 'retries', CHUNK_RETRIES)
+    return [], None, last_error
+
+
+# --- REDUCE: KONULARI BİRLEŞTİR ---
+def _normalize_title(title):
+    title = title.replace('İ', 'i').replace('I', 'ı').lower()
+    return re.sub(r'[^\w\s]', '', title).strip()
+
+
+def _valid_question(q):
+    return (isinstance(q, dict) and q.get('soru')
+            and all(q.get(k) for k in 'ABCD')
+            and str(q.get('dogru_sik', '')).strip() in ('A', 'B', 'C', 'D'))
+
+
+def merge_topics(parts):
+    """Pencerelerden gelen konuları sırayı koruyarak birleştirir, tekrarları ayıklar."""
+    merged = []
+    keys = []
+    for items in parts:
+        for item in items:
+            key = _normalize_title(item.get('alt_baslik', ''))
+            match = None
+            for i, other in enumerate(keys):
+                if key == other or difflib.SequenceMatcher(None, key, other).ratio() >= TITLE_SIMILARITY:
+                    match = i
+                    break
+            if match is None:
+                merged.append(dict(item))
+                keys.append(key)
+                continue
+
+            # Aynı konu iki pencerede geçmiş: daha dolu metni ve geçerli soruyu tut
+            kept = merged[match]
+            for field in ('ozet', 'ek_bilgi'):
+                if len(item.get(field) or '') > len(kept.get(field) or ''):
+                    kept[field] = item[field]
+            if not _valid_question(kept.get('soru_data')) and _valid_question(item.get('soru_data')):
+                kept['soru_data'] = item['soru_data']
+
+    return [item for item in merged if _valid_question(item.get('soru_data'))]
+
+
+def _warn_fallback(model_names, warnings):
+    if FALLBACK_MODEL in model_names and warnings is not None:
+        warnings.append(f"{PRIMARY_MODEL} yanıt vermedi, {FALLBACK_MODEL} kullanılıyor.")
+
+
+@instrument("gemini_analiz", ok=bool, measure=lambda res, args, kwargs: {'chars': len(args[0] if args else kwargs['full_text'])})
+def analyze_full_text_with_gemini(full_text, map_reduce=None, segments=None, cache=None, warnings=None):
+    """
+    map_reduce=None ise metin uzunluğuna göre otomatik seçilir.
+    segments (transkript parça metinleri) ve cache (DiskCache) verilirse map
+    pencereleri parçalardan kurulur ve metni önbellekteki bir pencereyle aynı
+    olan pencere tekrar analiz edilmez.
+    Arka plan işlerinde de çalıştığı için Streamlit'e yazmaz: uyarılar
+    verilen warnings listesine eklenir, analiz tümden başarısız olursa asıl
+    hata RuntimeError olarak fırlatılır.
+    """
+    if len(full_text) < 50: return []
+
+    if map_reduce is None:
+        map_reduce = len(full_text) > MAP_REDUCE_MIN_CHARS
+
+    if not map_reduce:
+        try:
+            response, model_name = model_selector.generate(build_prompt(full_text))
+            _warn_fallback([model_name], warnings)
+            return parse_response(response.text)
+        except Exception as e:
+            raise RuntimeError(f"AI Hatası: {e}") from e
+
+    windows = group_segments(segments) if segments else split_windows(full_text)
+    n = len(windows)
+    # Anahtar istemin kendisinden türer; istem şablonu değişirse eski sonuçlar kullanılmaz
+    keys = [make_key("gemini_pencere", build_prompt(w)) for w in windows] if cache is not None else [None] * n
+    results = [None] * n
+    for i, key in enumerate(keys):
+        items = cache.get_json(key, "topics.json") if key else None
+        if items is not None:
+            results[i] = (items, None, None)
+    todo = [i for i in range(n) if results[i] is None]
+    observe("gemini_pencere_yeniden", 'rows', n - len(todo))
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENCY) as ex:
+        for i, res in zip(todo, ex.map(lambda i: _analyze_window(windows[i], (i + 1, n)), todo)):
+            results[i] = res
+            if keys[i] and res[2] is None:
+                cache.put_json(keys[i], "topics.json", res[0])
+    _warn_fallback([name for _, name, _ in results], warnings)
+
+    failed = [i + 1 for i, (_, _, err) in enumerate(results) if err is not None]
+    if len(failed) == n:
+        raise RuntimeError(f"AI Hatası: {results[0][2]}") from results[0][2]
+    if failed and warnings is not None:
+        warnings.append(f"{n} bölümden {len(failed)} tanesi analiz edilemedi (bölüm: {', '.join(map(str, failed))}).")
+
+    return merge_topics([items for items, _, _ in results])
@@ -1,21 +1,20 @@
 import streamlit as st
-import whisper
 import os
-import tempfile
 import textwrap
-import google.generativeai as genai
-import json
-import subprocess
 import random
 import nest_asyncio
 import pandas as pd
 import numpy as np
 import time
-import firebase_admin
-import plotly.express as px # Grafik
-from firebase_admin import credentials, firestore
-from fpdf import FPDF
-from openai import OpenAI 
+from asr import ASR_ENGINE, ASR_MODEL, ASR_THREADS, BACKENDS, MODEL_SIZES, load_backend
+from cache import DiskCache
+from jobs import STAGES, STAGE_LABELS, JobRunner
+from metrics import instrument, observe, registry, start_exporter, timer
+from analysis import model_selector
+from lessons import lesson_store
+from results import DEFAULT_LESSON, aggregate_metrics, export_results, format_data_for_csv, load_aggregate, rebuild_aggregates, results_store
+from submissions import MAX_ATTEMPTS, SubmissionQueue
+from tts import AUDIO_SPEEDS, join_mp3, mp3_seconds, pregenerate_lesson, pregen_status, synthesize_chunks
 
 # --- AYARLAR ---
 st.set_page_config(page_title="Kişiselleştirilmiş Eğitim Platformu", layout="wide")
@@ -26,31 +25,43 @@ gemini_api_key = st.secrets["gemini_key"]
 openai_api_key = st.secrets["openai_key"]
 ADMIN_PASSWORD = st.secrets["admin_password"]
 
-# --- FIREBASE BAĞLANTISI ---
-db = None 
+# --- AĞIR KÜTÜPHANELER İLK KULLANIMDA YÜKLENİR ---
+# Her soğuk başlangıç whisper/torch, plotly, fpdf, firebase ve openai'ı yüklemesin:
+# öğrenci oturumu bunların çoğuna hiç, kalanına da ancak ilgili adımda ihtiyaç duyar.
+# Ölçüm için: python benchmarks/bench_import_time.py
 
-if not firebase_admin._apps:
-    try:
+# --- FIREBASE BAĞLANTISI ---
+@st.cache_resource(show_spinner=False)
+def _firestore_client():
+    # Hata fırlatırsa önbelleğe alınmaz, sonraki çalıştırmada tekrar denenir
+    import firebase_admin
+    from firebase_admin import credentials, firestore
+    if not firebase_admin._apps:
         key_dict = dict(st.secrets["firebase"])
         key_dict["private_key"] = key_dict["private_key"].replace("\\n", "\n")
-        cred = credentials.Certificate(key_dict)
-        firebase_admin.initialize_app(cred)
+        firebase_admin.initialize_app(credentials.Certificate(key_dict))
+    return firestore.client()
+
+def get_db():
+    try:
+        return _firestore_client()
     except Exception as e:
         st.error(f"Firebase Bağlantı Hatası: {e}")
-        st.stop()
-
-try:
-    db = firestore.client()
-except Exception as e:
-    st.error(f"Veritabanı İstemcisi Hatası: {e}")
+        return None
 
 # --- API BAĞLANTILARI ---
-client = None 
-try:
-    genai.configure(api_key=gemini_api_key)
-    client = OpenAI(api_key=openai_api_key)
-except: 
-    pass 
+model_selector.configure(gemini_api_key)
+
+@st.cache_resource(show_spinner=False)
+def _openai_client():
+    from openai import OpenAI
+    return OpenAI(api_key=openai_api_key)
+
+def get_openai_client():
+    try:
+        return _openai_client()
+    except Exception:
+        return None
 
 # --- STATE YÖNETİMİ ---
 def init_state():
@@ -62,8 +73,9 @@ def init_state():
         'pre_answers': {},
         'user_answers_post': {},
         'exam_finished': False,
-        'data': [],
+        'lesson_id': None,
         'mistakes': [],
+        'results_df': None,
         'audio_speed': 1.0 
     }
     for key, val in defaults.items():
@@ -72,76 +84,79 @@ def init_state():
 
 init_state()
 
+# --- ÖLÇÜMLER (METRICS_PORT tanımlıysa Prometheus /metrics ucu) ---
+start_exporter()
+
 # --- FIREBASE KAYIT ---
+@instrument("save_results_to_firebase", ok=bool)
 def save_results_to_firebase(student_data):
-    if db is None:
+    if get_db() is None:
         st.error("Veritabanı bağlantısı yok!")
         return False
     try:
-        doc_ref = db.collection('exam_results').document(str(student_data['no']))
-        doc_ref.set(student_data)
-        return True
+        # Kayıt yerel giden kutusuna yazılıp hemen onaylanır. Firestore'a arka planda,
+        # ders özetiyle birlikte gruplar halinde (tek transaction) gönderilir.
+        return get_submission_queue().submit(student_data)
     except Exception as e:
         st.error(f"Veritabanı Hatası: {e}")
         return False
 
-def get_class_data_from_firebase():
+@st.cache_resource
+def get_submission_queue():
+    return SubmissionQueue(get_db())
+
+def replay_outbox():
+    # Önceki süreçten giden kutusunda gönderim kaldıysa kuyruk hemen kurulup yazmaya başlar;
+    # yoksa kuyruk ilk gönderimde kurulur. Bağlantı yoksa öğrencilere hata gösterilmez.
+    if not results_store.outbox_count():
+        return
+    try:
+        _firestore_client()
+    except Exception:
+        return
+    get_submission_queue()
+
+replay_outbox()
+
+@instrument("get_class_data_from_firebase", measure=lambda res, args, kwargs: {'rows': len(res)})
+def get_class_data_from_firebase(as_frame=False):
+    db = get_db()
+    # Sadece son senkrondan sonra gelen kayıtlar çekilir, gerisi yerel önbellekten okunur.
+    # Firebase'e ulaşılamazsa yerel önbellekteki kayıtlar yine gösterilir.
     if db is None:
-        st.error("Veritabanı bağlantısı yok!")
-        return []
+        st.warning("Veritabanı bağlantısı yok, yerel kayıtlar gösteriliyor.")
+    else:
+        try:
+            results_store.sync(db)
+        except Exception as e:
+            st.warning(f"Veri Çekme Hatası, yerel kayıtlar gösteriliyor: {e}")
     try:
-        docs = db.collection('exam_results').stream()
-        data = []
-        for doc in docs:
-            data.append(doc.to_dict())
-        return data
+        return results_store.records_frame() if as_frame else results_store.records()
     except Exception as e:
-        st.error(f"Veri Çekme Hatası: {e}")
-        return []
-
-def format_data_for_csv(df, soru_sayisi_input=None):
-    # --- PUANLARI BİRLEŞTİR ---
-    if 'on_test_puan' in df.columns and 'on_test' in df.columns:
-        df['1. Test Doğru Sayısı'] = df['on_test_puan'].combine_first(df['on_test'])
-    elif 'on_test' in df.columns: df['1. Test Doğru Sayısı'] = df['on_test']
-    elif 'on_test_puan' in df.columns: df['1. Test Doğru Sayısı'] = df['on_test_puan']
-    else: df['1. Test Doğru Sayısı'] = 0 
-
-    if 'son_test_puan' in df.columns and 'son_test' in df.columns:
-        df['2. Test Doğru Sayısı'] = df['son_test_puan'].combine_first(df['son_test'])
-    elif 'son_test' in df.columns: df['2. Test Doğru Sayısı'] = df['son_test']
-    elif 'son_test_puan' in df.columns: df['2. Test Doğru Sayısı'] = df['son_test_puan']
-    else: df['2. Test Doğru Sayısı'] = 0
-
-    # --- SAYISAL DÖNÜŞÜM ---
-    df['1. Test Doğru Sayısı'] = pd.to_numeric(df['1. Test Doğru Sayısı'], errors='coerce').fillna(0).astype(int)
-    df['2. Test Doğru Sayısı'] = pd.to_numeric(df['2. Test Doğru Sayısı'], errors='coerce').fillna(0).astype(int)
-    df['NET'] = df['2. Test Doğru Sayısı'] - df['1. Test Doğru Sayısı']
-
-    # --- İSİMLERİ AYARLA ---
-    if 'ad_soyad' in df.columns: df['Ad Soyad'] = df['ad_soyad']
-    else: df['Ad Soyad'] = "Bilinmiyor"
-    if 'no' in df.columns: df['Öğrenci No'] = df['no']
-    else: df['Öğrenci No'] = 0
-
-    # --- SORU SAYISI (KRİTİK KISIM BURASI) ---
-    # Eğer veritabanından gelen veride 'toplam_soru' varsa onu kullan.
-    # Yoksa varsayılan (o anki dersin sorusu) değerini kullan.
-    varsayilan = soru_sayisi_input if (soru_sayisi_input and soru_sayisi_input > 0) else 15
-    
-    if 'toplam_soru' in df.columns:
-        df['Soru Sayısı'] = df['toplam_soru'].fillna(varsayilan).astype(int)
-    else:
-        df['Soru Sayısı'] = varsayilan
+        st.error(f"Yerel Önbellek Hatası: {e}")
+        return pd.DataFrame() if as_frame else []
 
-    # --- TABLO SÜTUNLARINI SEÇ ---
-    target_columns = ['Ad Soyad', 'Öğrenci No', 'Soru Sayısı', '1. Test Doğru Sayısı', '2. Test Doğru Sayısı', 'NET']
-    for col in target_columns:
-        if col not in df.columns:
-            df[col] = 0 if 'Sayısı' in col or 'NET' in col or 'No' in col else ""
+def count_lesson_records(lesson):
+    # Özet belgesi yokken bu derse ait kayıt gerçekten var mı (son senkrondan sonrası çekilir)
+    db = get_db()
+    try:
+        if db is not None:
+            results_store.sync(db)
+        return results_store.count(lesson)
+    except Exception as e:
+        st.warning(f"Kayıtlar sayılamadı: {e}")
+        return 0
 
-    return df[target_columns]
-    
+def get_class_aggregate(lesson):
+    db = get_db()
+    if db is None:
+        st.error("Veritabanı bağlantısı yok!")
+        return None
+    try:
+        return load_aggregate(db, lesson)
+    except Exception as e:
+        st.error(f"Veri Çekme Hatası: {e}")
+        return None
 
 # --- YARDIMCI FONKSİYONLAR ---
 def safe_text(text):
@@ -157,173 +172,136 @@ def safe_text(text):
     except:
         return text
 
-@st.cache_resource
-def load_whisper():
-    return whisper.load_model("base", device="cpu")
-
-def sesi_sokup_al(video_path, audio_path):
-    command = ["ffmpeg", "-i", video_path, "-vn", "-acodec", "libmp3lame", "-ar", "16000", "-ac", "1", "-y", audio_path]
-    try:
-        result = subprocess.run(command, capture_output=True, text=True)
-        if result.returncode != 0:
-            st.error(f"Video ses dönüştürme hatası (FFmpeg): {result.stderr}")
-            return False
-            
-        if not os.path.exists(audio_path) or os.path.getsize(audio_path) == 0:
-            st.error("Ses dosyası oluşturulamadı veya boş.")
-            return False
-            
-        return True
-    except Exception as e:
-        st.error(f"Sistem Hatası: {e}")
-        return False
-
-def analyze_full_text_with_gemini(full_text):
-    primary_model = "gemini-2.5-flash"
-    fallback_model = "gemini-2.0-flash"
-    
-    model = None
-    try:
-        model = genai.GenerativeModel(primary_model)
-        model.generate_content("test") 
-    except:
-        st.warning(f"⚠️ {primary_model} yanıt vermedi, {fallback_model} kullanılıyor.")
-        model = genai.GenerativeModel(fallback_model)
-
-    if len(full_text) < 50: return []
+@st.cache_resource(show_spinner=False)
+def load_asr(engine, model_size, threads=ASR_THREADS):
+    # Seçilen motor süreç boyunca bellekte kalır; her derste yeniden yüklenmez
+    return load_backend(engine, model_size, threads)
 
-    prompt = f"""
-    Sen uzman bir eğitim asistanısın. Video transkriptini analiz et.
-    
-    GÖREVLER:
-    1. Konuyu alt başlıklara böl.
-    2. Her başlık için video içeriğinden bir ÖZET çıkar.
-    3. [KRİTİK] Her başlık için, videoda geçmese bile, o konuyu akademik olarak destekleyen EK BİLGİ (Extra Resource) ekle.
-    4. Her başlık için bir test sorusu yaz.
-
-    Çıktı JSON Formatı:
-    [
-      {{
-        "alt_baslik": "Konu Başlığı",
-        "ozet": "Video özeti...",
-        "ek_bilgi": "Akademik ve teknik detay bilgi...",
-        "soru_data": {{
-            "soru": "Soru?",
-            "A": "...", "B": "...", "C": "...", "D": "...",
-            "dogru_sik": "A"
-        }}
-      }}
-    ]
-    METİN: "{full_text}"
-    """
-    try:
-        response = model.generate_content(prompt)
-        text = response.text.replace("```json", "").replace("```", "").strip()
-        start = text.find('[')
-        end = text.rfind(']') + 1
-        return json.loads(text[start:end])
-    except Exception as e:
-        st.error(f"AI Hatası: {e}")
-        return []
+# --- ÖNBELLEK (AYNI VİDEO TEKRAR YÜKLENİRSE) ---
+@st.cache_resource
+def get_cache():
+    return DiskCache()
 
-def generate_audio_openai(text, speed):
-    if not client or len(text) < 2: return None
-    tfile = tempfile.NamedTemporaryFile(delete=False, suffix=".mp3")
-    tfile.close()
-    try:
-        response = client.audio.speech.create(model="tts-1", voice="alloy", input=text, speed=speed)
-        response.stream_to_file(tfile.name)
-        return tfile.name
-    except: return None
+# --- DERS İŞLEME İŞLERİ (ARKA PLANDA, KALDIĞI YERDEN DEVAM EDER) ---
+@st.cache_resource
+def get_job_runner():
+    client = get_openai_client()
+    # Öğrenciler beklemesin diye sesler yayından hemen sonra arka planda hazırlanır
+    on_publish = (lambda analysis: pregenerate_lesson(client, analysis)) if client else None
+    return JobRunner(get_cache(), transcriber=load_asr, on_publish=on_publish)
+
+def generate_audio_openai(text, speed, spinner_text):
+    # Uzun metin parça parça seslendirilir: ilk parça hazır olunca tek oynatıcıda
+    # çalmaya başlar, tüm parçalar gelince oynatıcı birleşik sesle değiştirilir ve
+    # ilk parçanın o ana kadar çaldığı yerden devam eder. Önbellekteyse tek dosya gelir.
+    client = get_openai_client()
+    if not client or len(text) < 2: return
+    start = time.perf_counter()
+    with timer("generate_audio_openai") as m:
+        m.record('chars', len(text))
+        try:
+            with st.spinner(spinner_text):
+                parcalar = synthesize_chunks(client, text, speed)
+                ilk = next(parcalar)
+            observe("tts_ilk_ses", 'seconds', time.perf_counter() - start)
+            oynatici = st.empty()
+            oynatici.audio(ilk, autoplay=True)
+            calma_basi = time.perf_counter()
+            yollar = [ilk]
+            try:
+                yollar.extend(parcalar)
+            except Exception as e:
+                m.fail()
+                st.warning(f"Sesin bir kısmı oluşturulamadı, yalnızca ilk bölüm dinlenebilir: {e}")
+            else:
+                if len(yollar) > 1:
+                    konum = time.perf_counter() - calma_basi
+                    ilk_sure = mp3_seconds(ilk)
+                    if ilk_sure is not None:
+                        konum = min(konum, ilk_sure)
+                    oynatici.audio(join_mp3(yollar), format="audio/mpeg", start_time=int(konum), autoplay=True)
+            m.record('bytes', sum(os.path.getsize(p) for p in yollar))
+        except Exception as e:
+            m.fail()
+            st.warning(f"Ses oluşturulamadı: {e}")
     
-# --- PDF SINIFI (TÜRKÇE DESTEKLİ) ---
-class PDF(FPDF):
-    def header(self):
-        # Header otomatik çalıştığı için fontu burada tekrar set etmemiz gerekebilir
-        # Ancak add_font aşağıda yapıldığı için burada direkt kullanabiliriz.
-        # Eğer hata alırsanız header içindeki fontu 'Arial' bırakıp gövdeyi değiştirebiliriz
-        # ama genelde çalışır.
-        self.set_font('Roboto', 'B', 15)
-        self.cell(0, 10, 'Kişiselleştirilmiş Çalışma Planı', 0, 1, 'C') # Artık Türkçe yazabiliriz
-        self.ln(5)
-
-    def topic_section(self, title, summary, extra_info, is_mistake, include_extra):
-        if is_mistake:
-            self.set_text_color(200, 0, 0)
-            title = f"(!) {title} - [TEKRAR ET]"
-        else:
-            self.set_text_color(0, 100, 0)
-            title = f"{title} (Tamamlandı)" # 'ı' harfi artık sorun değil
-            
-        # Başlık Fontu
-        self.set_font('Roboto', 'B', 12)
-        self.cell(0, 10, title, ln=1)
-        
-        # İçerik Fontu
-        self.set_text_color(0)
-        self.set_font('Roboto', '', 11)
-        # safe_text kullanmıyoruz, direkt summary veriyoruz
-        self.multi_cell(0, 6, summary)
-        self.ln(2)
-        
-        if include_extra and extra_info:
-            self.set_text_color(80, 80, 80)
-            self.set_font('Roboto', '', 10) # İtalik dosyanız yoksa Normal ('') kullanın
-            self.multi_cell(0, 6, f"[EK KAYNAK]: {extra_info}")
-            self.ln(2)
-            
-        self.set_draw_color(200, 200, 200)
-        self.line(10, self.get_y(), 200, self.get_y())
-        self.ln(5)
+@st.cache_data(max_entries=512, show_spinner=False)
+def cached_study_pdf(version, mistakes, include_extra, _data):
+    # Ders sürümü + yanlışlar + rapor türü aynıysa PDF tekrar dizilmez.
+    # Hata fırlatılır; st.cache_data hatalı sonucu önbelleğe almaz.
+    return create_study_pdf(_data, set(mistakes), include_extra)
 
+@instrument("create_study_pdf", measure=lambda pdf, args, kwargs: {'bytes': len(pdf)})
 def create_study_pdf(data, mistakes, include_extra=True):
-    pdf = PDF()
-    
-    # --- KRİTİK KISIM: FONT DOSYALARINI TANITMA ---
-    # Dosyaların app3.py ile AYNI klasörde olduğundan emin olun.
+    # --- KRİTİK KISIM: FONT DOSYALARI ---
+    # Dosyaların app3.py ile AYNI klasörde olduğundan emin olun. Font ya da dizgi
+    # hatası fırlatılır (bkz. indirme düğmeleri).
+    from report import render_study_pdf
+    return render_study_pdf(data, mistakes, include_extra)
+
+def study_pdf(version, mistakes, include_extra, data):
+    # İndirme tıklanınca betik thread'i dışında çalışır, st.error gösterilemez:
+    # hata Streamlit'e iletilir ("Failed to generate file for download" + sunucu
+    # günlüğü), boş/bozuk dosya inmez ve sonraki tıklama PDF'i yeniden dener.
     try:
-        # uni=True parametresi Türkçe karakterlerin (UTF-8) düzgün işlenmesini sağlar.
-        pdf.add_font('Roboto', '', 'Roboto-Regular.ttf', uni=True)
-        pdf.add_font('Roboto', 'B', 'Roboto-Bold.ttf', uni=True)
+        return cached_study_pdf(version, mistakes, include_extra, data)
     except Exception as e:
-        st.error(f"Font yükleme hatası: {e}")
-        return None
-
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    
-    # Başlık kısmı
-    pdf.set_font("Roboto", '', 10)
-    pdf.set_text_color(100, 100, 100)
-    type_str = "Detaylı Rapor (Ek Kaynaklı)" if include_extra else "Özet Rapor"
-    pdf.cell(0, 10, f"Rapor Türü: {type_str}", ln=1, align='C')
-    pdf.ln(5)
-    
-    for i, item in enumerate(data):
-        baslik = item.get('alt_baslik', 'Konu')
-        ozet = item.get('ozet', '')
-        ek_bilgi = item.get('ek_bilgi', '')
-        is_mistake = i in mistakes
-        
-        # safe_text fonksiyonunu ARTIK KULLANMIYORUZ
-        pdf.topic_section(baslik, ozet, ek_bilgi, is_mistake, include_extra)
-        
-    # Çıktı alma
-    return pdf.output(dest='S').encode('latin-1', 'replace') 
-    # Not: FPDF'in bazı versiyonlarında .encode() gereklidir, 
-    # font yüklenince içerik binary'e dönüşür, bu kod genelde çalışır.
+        raise RuntimeError(f"PDF oluşturma hatası: {e}") from e
+
+# --- DERS İŞLERİNİN DURUMU (2 SN'DE BİR KENDİNİ YENİLER) ---
+@st.fragment(run_every=2)
+def ders_isleri():
+    runner = get_job_runner()
+    for job in runner.jobs():
+        ikon = {"queued": "⏳", "running": "⚙️", "done": "✅", "failed": "❌"}[job.status]
+        with st.container(border=True):
+            st.markdown(f"{ikon} **Ders işi {job.id[:8]}** · {job.params['engine']} / {job.params['model_size']} · "
+                        f"{time.strftime('%d.%m %H:%M', time.localtime(job.created))}")
+            cols = st.columns(len(STAGES))
+            for col, stage_name in zip(cols, STAGES):
+                stage = job.stages[stage_name]
+                etiket = STAGE_LABELS[stage_name]
+                if stage['status'] == 'done':
+                    # Yeniden yüklenen derste önceki transkriptten alınan parçalar
+                    yeniden = f", {stage['reused'][0]}/{stage['reused'][1]} parça hazırdı" if stage.get('reused', [0])[0] else ""
+                    col.caption(f"✅ {etiket} ({stage['finished'] - stage['started']:.0f} sn{yeniden})")
+                elif stage['status'] == 'running':
+                    col.progress(stage['progress'], text=f"{etiket}...")
+                elif stage['status'] == 'failed':
+                    col.caption(f"❌ {etiket}")
+                else:
+                    col.caption(f"▫️ {etiket}")
+            for stage_name in STAGES:
+                for uyari in job.stages[stage_name].get('warnings', []):
+                    st.warning(f"⚠️ {STAGE_LABELS[stage_name]}: {uyari}")
+            if job.status == "failed":
+                st.error(job.error)
+                if st.button("Kaldığı Yerden Devam Et", key=f"resume_{job.id}"):
+                    runner.resume(job.id)
+            elif job.status == "done":
+                st.caption("Ders yayınlandı." + (" (Güncel ders)" if job.lesson_id == lesson_store.current_id() else ""))
+
+# --- SES ÖN ÜRETİM DURUMU (2 SN'DE BİR KENDİNİ YENİLER) ---
+@st.fragment(run_every=2)
+def tts_ilerleme():
+    job = pregen_status()
+    if job is None or job.total == 0:
+        return
+    bitti = job.done + job.failed
+    if job.running:
+        st.progress(bitti / job.total, text=f"🔊 Sesler hazırlanıyor: {bitti}/{job.total}")
+    else:
+        sure = job.finished - job.started
+        st.caption(f"🔊 Sesler hazır: {job.done}/{job.total} ({job.failed} hata, {sure:.0f} sn)")
 
 # ================= ARAYÜZ (SADE VE 2 SEKMELİ ADMIN) =================
 
 st.title("Kişiselleştirilmiş Eğitim Platformu")
 
-LESSON_FILE = "lesson_data.json"
-
-if os.path.exists(LESSON_FILE) and not st.session_state['data']:
-    try:
-        with open(LESSON_FILE, 'r', encoding='utf-8') as f:
-            st.session_state['data'] = json.load(f)
-    except: pass
+def ders():
+    # Oturum sadece ders kimliğini tutar; içerik süreç genelindeki depodan paylaşılır
+    lesson = lesson_store.get(st.session_state['lesson_id'])
+    return lesson.topics if lesson else ()
 
 # --- GİRİŞ EKRANI ---
 if st.session_state['step'] == 0:
@@ -335,7 +313,9 @@ if st.session_state['step'] == 0:
         s_no = st.text_input("Öğrenci No")
         if st.button("Sınava Başla"):
             if s_name and s_no:
-                if not st.session_state['data']:
+                # Sınav başladığı andaki ders sürümüne sabitlenir
+                st.session_state['lesson_id'] = lesson_store.current_id()
+                if not ders():
                     st.error("Ders bulunamadı.")
                 else:
                     st.session_state['student_info'] = {'name': s_name, 'no': s_no}
@@ -357,6 +337,8 @@ if st.session_state['step'] == 0:
 # --- ADIM 1: YÖNETİCİ PANELİ (2 SEKMELİ) ---
 elif st.session_state['step'] == 1 and st.session_state['user_role'] == 'admin':
     st.header("Yönetici Paneli")
+    # Yönetici her zaman en son yayınlanan dersi görür
+    st.session_state['lesson_id'] = lesson_store.current_id()
     
     # İki sekme oluşturuyoruz: Video Yükleme ve Sonuçlar
     tab_upload, tab_results = st.tabs(["📚 Ders İşle / Video Yükle", "📊 Sınav Sonuçları"])
@@ -365,74 +347,120 @@ elif st.session_state['step'] == 1 and st.session_state['user_role'] == 'admin':
     with tab_upload:
         st.subheader("Yeni Ders İçeriği Yükle")
         up = st.file_uploader("Video (.mp4)", type=["mp4"])
+        c_motor, c_model = st.columns(2)
+        motor = c_motor.selectbox("Transkripsiyon motoru", list(BACKENDS), index=list(BACKENDS).index(ASR_ENGINE) if ASR_ENGINE in BACKENDS else 0,
+                                  help="faster-whisper: CTranslate2, CPU'da int8 (daha hızlı, daha az bellek)")
+        model_boyu = c_model.selectbox("Model boyu", MODEL_SIZES, index=MODEL_SIZES.index(ASR_MODEL))
+        paralel = st.toggle("Paralel transkripsiyon (tüm çekirdekler)", value=True)
+        parcali = st.toggle("Uzun dersleri bölümler halinde analiz et", value=True)
         if up and st.button("Dersi İşle"):
-            with st.spinner("Yapay zeka çalışıyor..."):
-                try:
-                    tfile = tempfile.NamedTemporaryFile(delete=False, suffix=".mp4")
-                    tfile.write(up.read())
-                    audio_path = tfile.name.replace(".mp4", ".mp3")
-                    
-                    if sesi_sokup_al(tfile.name, audio_path):
-                        model_w = load_whisper()
-                        res = model_w.transcribe(audio_path)
-                        analysis = analyze_full_text_with_gemini(res['text'])
-                        
-                        if analysis:
-                            with open(LESSON_FILE, 'w', encoding='utf-8') as f:
-                                json.dump(analysis, f, ensure_ascii=False)
-                            st.session_state['data'] = analysis
-                            st.success("Ders hazırlandı!")
-                        else: st.error("AI Yanıt Vermedi.")
-                    else: st.error("Ses ayrıştırılamadı.")
-                except Exception as e: st.error(str(e))
+            # İş arka planda çalışır; sayfa yenilense de kaybolmaz, ilerleme aşağıda izlenir
+            job = get_job_runner().submit(up, motor, model_boyu, paralel, map_reduce=None if parcali else False)
+            if job.status == "done":
+                st.info(f"Bu ders aynı ayarlarla daha önce işlenmiş (iş {job.id[:8]}); yeniden güncel ders yapıldı.")
+
+        ders_isleri()
+        tts_ilerleme()
+
+        # Model seçici süreç genelinde tutulur; hangi model ne sıklıkla ve ne hızda çalışmış
+        with st.expander("🤖 Gemini Model Durumu"):
+            st.dataframe(pd.DataFrame(model_selector.stats()), use_container_width=True)
+
+        # Hangi aşama yavaş: ffmpeg, transkripsiyon, Gemini, TTS, PDF, Firestore
+        with st.expander("⏱️ Aşama Ölçümleri"):
+            ozet = registry.summary()
+            if ozet:
+                st.dataframe(pd.DataFrame(ozet), use_container_width=True)
+            else:
+                st.caption("Henüz ölçüm yok.")
+            c_asama, c_profil = st.columns([3, 1])
+            asama = c_asama.selectbox("Profillenecek aşama", [
+                "sesi_sokup_al", "transcribe", "gemini_analiz", "generate_audio_openai", "tts_ilk_ses",
+                "create_study_pdf", "save_results_to_firebase", "get_class_data_from_firebase",
+            ])
+            if c_profil.button("Sonraki çağrıyı profille"):
+                registry.arm_profile(asama)
+                st.toast(f"{asama} aşamasının bir sonraki çağrısı cProfile ile kaydedilecek.")
+            for stage, path, metin in reversed(registry.profiles):
+                st.caption(f"{stage} → {path}")
+                st.code(metin, language=None)
     
     # 2. SEKME: SINAV SONUÇLARI (GRAFİK + METRİKLER + DÜZELTİLMİŞ CSV)
     with tab_results:
         st.subheader("📊 Sınıf Performans Analizi")
-        if st.button("Sonuçları Getir / Yenile", type="primary"):
-            data_raw = get_class_data_from_firebase()
+        db = get_db()
+
+        # --- A) İSTATİSTİK KARTLARI (EN ÜST, TEK BELGE OKUMASI) ---
+        # Kartlar yalnızca güncel ders sürümünü, aşağıdaki tablo ve grafikler tüm kayıtları kapsar
+        ders_anahtari = st.session_state['lesson_id'] or DEFAULT_LESSON
+        st.caption(f"Güncel ders sürümü ({ders_anahtari[:8]}) · aşağıdaki tablo tüm derslerin kayıtlarını içerir")
+        agg = get_class_aggregate(ders_anahtari)
+        if agg:
+            total_student, avg_net, max_score = aggregate_metrics(agg)
             
-            if data_raw:
-                df_raw = pd.DataFrame(data_raw)
-                # Soru sayısını al (varsayılan 15)
-                varsayilan_soru = len(st.session_state['data']) if st.session_state['data'] else 15
-                df_clean = format_data_for_csv(df_raw, soru_sayisi_input=varsayilan_soru)
-                
-                # --- A) İSTATİSTİK KARTLARI (EN ÜST) ---
-                avg_net = df_clean['NET'].mean()
-                max_score = df_clean['2. Test Doğru Sayısı'].max()
-                total_student = len(df_clean)
-                
-                c1, c2, c3 = st.columns(3)
-                c1.metric("Toplam Öğrenci", f"{total_student} Kişi")
-                c2.metric("Sınıf Ortalama Gelişim (NET)", f"+{avg_net:.1f}", delta_color="normal")
-                c3.metric("En Yüksek Son Test Doğrusu", f"{int(max_score)}")
-                
-                st.divider()
+            c1, c2, c3 = st.columns(3)
+            c1.metric("Bu Dersteki Öğrenci", f"{total_student} Kişi")
+            c2.metric("Ders Ortalama Gelişim (NET)", f"+{avg_net:.1f}", delta_color="normal")
+            c3.metric("En Yüksek Son Test Doğrusu", f"{int(max_score)}")
+        else:
+            kayit_sayisi = count_lesson_records(ders_anahtari)
+            if not kayit_sayisi:
+                st.caption("Bu derse henüz sınav gönderimi yok.")
+            else:
+                # Özet belgesi olmayan eski kayıtlar
+                st.caption(f"Bu dersin {kayit_sayisi} kaydı var ama özeti bulunamadı; özetleri yeniden hesaplayın.")
+                if st.button("Özetleri Yeniden Hesapla") and db is not None:
+                    with st.spinner("Kayıtlar taranıyor..."):
+                        rebuild_aggregates(db)
+                    st.rerun()
+        
+        kuyruk = get_submission_queue() if db is not None else None
+        bekleyen = kuyruk.pending_count() if kuyruk else 0
+        if bekleyen:
+            hata = f" Son hata: {kuyruk.last_error}" if kuyruk.last_error else ""
+            st.caption(f"⏳ {bekleyen} gönderim veritabanına yazılmak üzere kuyrukta.{hata}")
+        bekletilen = kuyruk.dead_letters() if kuyruk else []
+        if bekletilen:
+            st.error(f"❗ {len(bekletilen)} gönderim {MAX_ATTEMPTS} denemede yazılamadı ve bekletmeye alındı "
+                     f"(öğrenci no: {', '.join(no for no, _, _ in bekletilen[:10])}). Son hata: {bekletilen[0][1]}")
+            if st.button("Bekletilen Gönderimleri Tekrar Dene"):
+                kuyruk.retry_dead()
+                st.rerun()
+        
+        st.divider()
 
+        if st.button("Sonuçları Getir / Yenile", type="primary"):
+            df_raw = get_class_data_from_firebase(as_frame=True)
+            # Soru sayısını al (varsayılan 15)
+            varsayilan_soru = len(ders()) or 15
+            # Sayfa değiştirince grafik kaybolmasın diye tablo oturumda tutulur
+            st.session_state['results_df'] = format_data_for_csv(df_raw, soru_sayisi_input=varsayilan_soru)
+
+        df_clean = st.session_state['results_df']
+        if df_clean is not None:
+            if not df_clean.empty:
                 # --- B) GELİŞİM GRAFİĞİ (PLOTLY - KIRMIZI/YEŞİL) ---
                 st.markdown("### 📈 Öğrenci Bazlı Gelişim Grafiği")
+                # Plotly sadece bu sekmede gerekir
+                from charts import CHART_MAX_ROWS, net_histogram, sampled_student_chart, score_distribution, student_bar_chart
                 
-                # Veriyi grafik için uygun formata (uzun format) çeviriyoruz
-                df_chart = df_clean[['Ad Soyad', '1. Test Doğru Sayısı', '2. Test Doğru Sayısı']]
-                df_melted = df_chart.melt(id_vars='Ad Soyad', var_name='Test Türü', value_name='Puan')
-                
-                # Grafiği Çiz
-                fig = px.bar(
-                    df_melted, 
-                    x='Ad Soyad', 
-                    y='Puan', 
-                    color='Test Türü',
-                    barmode='group', # Sütunları yan yana koy
-                    text_auto=True,  # Puanı üstüne yaz
-                    color_discrete_map={
-                        '1. Test Doğru Sayısı': '#EF553B', # Kırmızı
-                        '2. Test Doğru Sayısı': '#00CC96'  # Yeşil
-                    },
-                    title="Ön Test vs Son Test Karşılaştırması"
-                )
-                fig.update_layout(xaxis_title="Öğrenciler", yaxis_title="Doğru Sayısı")
-                st.plotly_chart(fig, use_container_width=True)
+                if len(df_clean) <= CHART_MAX_ROWS:
+                    st.plotly_chart(student_bar_chart(df_clean), use_container_width=True)
+                else:
+                    # Kalabalık sınıf: özet grafikler + sayfalı / örneklemli öğrenci görünümü
+                    g1, g2 = st.columns(2)
+                    g1.plotly_chart(net_histogram(df_clean), use_container_width=True)
+                    g2.plotly_chart(score_distribution(df_clean), use_container_width=True)
+
+                    gorunum = st.radio("Öğrenci görünümü", ["Sayfalı", "Örneklem"], horizontal=True)
+                    if gorunum == "Sayfalı":
+                        sayfa_sayisi = (len(df_clean) - 1) // CHART_MAX_ROWS + 1
+                        sayfa = st.number_input("Sayfa", min_value=1, max_value=sayfa_sayisi, value=1)
+                        bas = (sayfa - 1) * CHART_MAX_ROWS
+                        parca = df_clean.iloc[bas:bas + CHART_MAX_ROWS]
+                        st.plotly_chart(student_bar_chart(parca, title=f"Ön Test vs Son Test ({sayfa}/{sayfa_sayisi}. sayfa)"), use_container_width=True)
+                    else:
+                        st.plotly_chart(sampled_student_chart(df_clean), use_container_width=True)
 
                 st.divider()
                 
@@ -440,25 +468,66 @@ elif st.session_state['step'] == 1 and st.session_state['user_role'] == 'admin':
                 st.markdown("### 📋 Detaylı Liste")
                 st.dataframe(df_clean, use_container_width=True)
                 
-                # CSV İNDİRME (Hata veren yer burasıydı, şimdi encode eklendi)
-                csv = df_clean.to_csv(sep=';', index=False).encode('utf-8-sig')
-                
-                st.download_button(
+                # İNDİRME: dosya tıklanınca yerel önbellekten parça parça yazılır
+                varsayilan_soru = len(ders()) or 15
+                c_csv, c_parquet = st.columns(2)
+                c_csv.download_button(
                     label="📥 Tabloyu Excel (CSV) Olarak İndir",
-                    data=csv,
+                    data=lambda: export_results('csv', varsayilan_soru),
                     file_name="ogrenci_sinav_sonuclari.csv",
                     mime="text/csv",
                     use_container_width=True
                 )
+                c_parquet.download_button(
+                    label="🧮 Analiz İçin Parquet İndir",
+                    data=lambda: export_results('parquet', varsayilan_soru),
+                    file_name="ogrenci_sinav_sonuclari.parquet",
+                    mime="application/vnd.apache.parquet",
+                    use_container_width=True
+                )
             else: 
                 st.info("Henüz veritabanında kayıtlı sınav sonucu yok.")
 
+        st.divider()
+
+        # --- D) TOPLU ÇALIŞMA PLANI (TÜM SINIF) ---
+        st.markdown("### 🖨️ Toplu Çalışma Planları")
+        toplu_detayli = st.checkbox("Ek kaynakları dahil et", value=True, key="toplu_detayli")
+        if st.button("Tüm Öğrencilerin Planlarını Hazırla"):
+            if not ders():
+                st.error("Ders bulunamadı.")
+            else:
+                kayitlar = get_class_data_from_firebase()
+                # Sadece yanlışları kayıtlı ve bu derse ait sonuçlar
+                ogrenciler = [
+                    r for r in kayitlar
+                    if 'yanlislar' in r and r.get('ders_surumu') in (None, st.session_state['lesson_id'])
+                ]
+                atlanan = len(kayitlar) - len(ogrenciler)
+                if not ogrenciler:
+                    st.info("Yanlış listesi kayıtlı öğrenci sonucu yok.")
+                else:
+                    with st.spinner("PDF'ler hazırlanıyor..."):
+                        from report import build_class_zip
+                        zip_file, n_ogrenci, n_pdf = build_class_zip(ders(), ogrenciler, include_extra=toplu_detayli)
+                    st.success(f"{n_ogrenci} öğrenci için plan hazır ({n_pdf} farklı PDF dizildi).")
+                    if atlanan:
+                        st.caption(f"{atlanan} kayıt eski ders veya yanlış listesi olmadığı için atlandı.")
+                    st.download_button(
+                        label="📦 Tüm Planları İndir (ZIP)",
+                        data=zip_file,
+                        file_name="calisma_planlari.zip",
+                        mime="application/zip",
+                        on_click="ignore",
+                        use_container_width=True
+                    )
+
 # --- ADIM 2: ÖN TEST ---
 elif st.session_state['step'] == 2:
     st.info(f"Merhaba {st.session_state['student_info']['name']}, sınava hoşgeldin.")
     with st.form("pre_test"):
         ans = {}
-        for i, item in enumerate(st.session_state['data']):
+        for i, item in enumerate(ders()):
             q = item['soru_data']
             st.write(f"**{i+1})** {q['soru']}")
             ans[i] = st.radio("Cevap", [q['A'], q['B'], q['C'], q['D']], key=f"p_{i}", index=None)
@@ -467,7 +536,7 @@ elif st.session_state['step'] == 2:
         if st.form_submit_button("Testi Bitir"):
             score = 0
             mistakes = []
-            for i, item in enumerate(st.session_state['data']):
+            for i, item in enumerate(ders()):
                 q = item['soru_data']
                 correct = q[q['dogru_sik'].strip()]
                 if ans.get(i) == correct: score += 1
@@ -488,9 +557,11 @@ elif st.session_state['step'] == 3:
         st.balloons()
         st.success("🎉 Tebrikler! Hiç eksiğin yok.")
 
-    # --- PDFLERİ HAZIRLA ---
-    pdf_ozet = create_study_pdf(st.session_state['data'], st.session_state['mistakes'], include_extra=False)
-    pdf_full = create_study_pdf(st.session_state['data'], st.session_state['mistakes'], include_extra=True)
+    # --- PDFLER (SADECE İNDİRME İSTENİNCE HAZIRLANIR) ---
+    pdf_args = (st.session_state['lesson_id'], tuple(sorted(st.session_state['mistakes'])))
+    pdf_data = ders()
+    pdf_ozet = lambda: study_pdf(*pdf_args, False, pdf_data)
+    pdf_full = lambda: study_pdf(*pdf_args, True, pdf_data)
 
     # --- KONTROL PANELİ ---
     with st.container(border=True):
@@ -504,7 +575,8 @@ elif st.session_state['step'] == 3:
         
         with col_speed:
             st.markdown("### 🎚️ Hız")
-            audio_speed = st.select_slider("Ses Hızı", options=[0.75, 1.0, 1.25, 1.5, 2.0], value=1.0, label_visibility="collapsed")
+            # key ile seçilen hız doğrudan session_state['audio_speed']'e yazılır
+            st.select_slider("Ses Hızı", options=AUDIO_SPEEDS, key="audio_speed", label_visibility="collapsed")
 
         with col_next:
             st.markdown("### 🚀 Bitir")
@@ -516,7 +588,7 @@ elif st.session_state['step'] == 3:
     st.markdown("### 📝 Konu Listesi")
 
    # --- YENİ KART TASARIMI (Buton Altta) ---
-    for i, item in enumerate(st.session_state['data']):
+    for i, item in enumerate(ders()):
         is_wrong = i in st.session_state['mistakes']
         
         # 1. KUTU (CONTAINER) BAŞLANGICI
@@ -534,9 +606,7 @@ elif st.session_state['step'] == 3:
             # C) Dinle Butonu (Özetin hemen altına gelir)
             # İsterseniz 'use_container_width=True' ekleyerek butonu tam genişlik yapabilirsiniz.
             if st.button("🔊 Özeti Dinle", key=f"d_{i}"):
-                with st.spinner("Ses hazırlanıyor..."):
-                    p = generate_audio_openai(item['ozet'], st.session_state['audio_speed'])
-                    if p: st.audio(p, autoplay=True)
+                generate_audio_openai(item['ozet'], st.session_state['audio_speed'], "Ses hazırlanıyor...")
 
             # D) Ek Kaynak Alanı (Bir ayraç ile alt kısma ekledik)
             ek_bilgi = item.get('ek_bilgi')
@@ -547,9 +617,7 @@ elif st.session_state['step'] == 3:
                     
                     # Ek kaynak dinleme butonu
                     if st.button("🎧 Ek Kaynağı Dinle", key=f"ed_{i}"):
-                        with st.spinner("Ek kaynak seslendiriliyor..."):
-                            p = generate_audio_openai(ek_bilgi, st.session_state['audio_speed'])
-                            if p: st.audio(p, autoplay=True)
+                        generate_audio_openai(ek_bilgi, st.session_state['audio_speed'], "Ek kaynak seslendiriliyor...")
         
         st.divider() # Konular arasına çizgi
 
@@ -557,7 +625,7 @@ elif st.session_state['step'] == 3:
 elif st.session_state['step'] == 4:
     with st.form("post_test"):
         ans = {}
-        for i, item in enumerate(st.session_state['data']):
+        for i, item in enumerate(ders()):
             q = item['soru_data']
             st.write(f"**{i+1})** {q['soru']}")
             
@@ -569,7 +637,7 @@ elif st.session_state['step'] == 4:
         
         if st.form_submit_button("Sınavı Bitir"):
             score = 0
-            for i, item in enumerate(st.session_state['data']):
+            for i, item in enumerate(ders()):
                 q = item['soru_data']
                 correct = q.get(q['dogru_sik'].strip())
                 if ans.get(i) == correct: score += 1
@@ -580,11 +648,14 @@ elif st.session_state['step'] == 4:
                 "tarih": time.strftime("%Y-%m-%d %H:%M"),
                 "on_test": st.session_state['scores'].get('pre', 0),
                 "son_test": score,
-                "toplam_soru": len(st.session_state['data']) 
+                "toplam_soru": len(ders()),
+                # Toplu plan çıktısı için ön testte yanlış yapılan konular
+                "yanlislar": list(st.session_state['mistakes']),
+                "ders_surumu": st.session_state['lesson_id']
             }
             if save_results_to_firebase(res):
                 st.balloons()
-                st.success(f"Sınav Bitti! Puan: {score} / {len(st.session_state['data'])}")
+                st.success(f"Sınav Bitti! Puan: {score} / {len(ders())}")
 
 
 
@@ -0,0 +1,102 @@
+# --- TRANSKRİPSİYON MOTORLARI ---
+# Aynı arayüzü sunan değiştirilebilir konuşma tanıma motorları:
+#   "whisper"        : openai-whisper, PyTorch fp32 (mevcut davranış)
+#   "faster-whisper" : CTranslate2 tabanlı Whisper, CPU'da int8 nicemlenmiş
+# Motor, model boyu ve thread sayısı ortam değişkenleriyle seçilir. Motorlar
+# process havuzundaki işçilerde de yüklendiği için Streamlit'e bağımlı değildir.
+import os
+import abc
+
+import numpy as np
+
+ASR_ENGINE = os.environ.get("ASR_ENGINE", "whisper")
+ASR_MODEL = os.environ.get("ASR_MODEL", "base")
+ASR_THREADS = int(os.environ.get("ASR_THREADS", "0")) or (os.cpu_count() or 1)
+ASR_COMPUTE_TYPE = os.environ.get("ASR_COMPUTE_TYPE", "int8")
+
+MODEL_SIZES = ["tiny", "base", "small", "medium", "large-v3"]
+if ASR_MODEL not in MODEL_SIZES:
+    MODEL_SIZES.append(ASR_MODEL)
+
+
+def pcm_to_float(pcm):
+    """int16 PCM'i Whisper'ın beklediği [-1, 1] aralığındaki float32'ye çevirir."""
+    if pcm.dtype == np.float32:
+        return pcm
+    return pcm.astype(np.float32) / 32768.0
+
+
+class TranscriptionBackend(abc.ABC):
+    """
+    Motor arayüzü. transcribe() 16 kHz mono PCM (int16 ya da float32) alır ve
+    whisper'ın transcribe() çıktısıyla aynı biçimde döner: text, segments, language.
+    """
+    name = None
+
+    def __init__(self, model_size=ASR_MODEL, threads=ASR_THREADS):
+        self.model_size = model_size
+        self.threads = threads
+
+    @abc.abstractmethod
+    def transcribe(self, audio, language=None):
+        """Sesi yazıya döker."""
+
+
+class WhisperBackend(TranscriptionBackend):
+    name = "whisper"
+
+    def __init__(self, model_size=ASR_MODEL, threads=ASR_THREADS):
+        super().__init__(model_size, threads)
+        import torch
+        import whisper
+        torch.set_num_threads(threads)
+        self.model = whisper.load_model(model_size, device="cpu")
+
+    def transcribe(self, audio, language=None):
+        return self.model.transcribe(pcm_to_float(audio), language=language, fp16=False)
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    name = "faster-whisper"
+
+    def __init__(self, model_size=ASR_MODEL, threads=ASR_THREADS, compute_type=ASR_COMPUTE_TYPE):
+        super().__init__(model_size, threads)
+        from faster_whisper import WhisperModel
+        self.compute_type = compute_type
+        self.model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=threads)
+
+    def transcribe(self, audio, language=None):
+        parts, info = self.model.transcribe(pcm_to_float(audio), language=language, beam_size=5)
+        # parts bir üreteç; asıl çözümleme burada, tüketilirken yapılır
+        segments = [
+            {'id': i, 'start': round(s.start, 2), 'end': round(s.end, 2), 'text': s.text}
+            for i, s in enumerate(parts)
+        ]
+        return {
+            'text': "".join(s['text'] for s in segments).strip(),
+            'segments': segments,
+            'language': info.language,
+        }
+
+
+BACKENDS = {
+    WhisperBackend.name: WhisperBackend,
+    FasterWhisperBackend.name: FasterWhisperBackend,
+}
+
+
+def load_backend(engine=ASR_ENGINE, model_size=ASR_MODEL, threads=ASR_THREADS):
+    """Motoru yükler. Bilinmeyen motor adında ValueError fırlatır."""
+    if engine not in BACKENDS:
+        raise ValueError(f"Bilinmeyen transkripsiyon motoru: {engine} (seçenekler: {', '.join(BACKENDS)})")
+    return BACKENDS[engine](model_size, threads)
+
+
+def backend_cache_id(engine=ASR_ENGINE, model_size=ASR_MODEL):
+    """Transkript önbellek anahtarına giren kimlik; motor/model değişince önbellek ayrışır."""
+    if engine == WhisperBackend.name:
+        # Önceki sürümlerin anahtarı sadece model adıydı; eski transkriptler geçerli kalsın
+        return model_size
+    if engine == FasterWhisperBackend.name:
+        return (engine, model_size, ASR_COMPUTE_TYPE)
+    return (engine, model_size)
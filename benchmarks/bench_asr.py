@@ -0,0 +1,108 @@
+# --- BENCHMARK: TRANSKRİPSİYON MOTORLARI ---
+# Motorları (openai-whisper fp32, faster-whisper int8) aynı ses üzerinde
+# karşılaştırır: model yükleme süresi, gerçek zaman oranı (RTF = işlem süresi /
+# ses süresi; 1'in altı gerçek zamandan hızlı) ve tepe bellek (RSS). Her motor
+# ayrı bir süreçte çalışır ki RSS ölçümleri birbirine karışmasın.
+# Kullanım: python benchmarks/bench_asr.py [--media video.mp4] [--model base] [--threads N] [--json]
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import numpy as np
+
+from asr import ASR_MODEL, ASR_THREADS, BACKENDS, load_backend
+from transcription import SAMPLE_RATE, extract_pcm
+
+
+def synthetic_pcm(seconds=60, seed=0):
+    """Medya verilmezse: konuşma benzeri zarf ile modüle edilmiş gürültü + ton (int16)."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    envelope = (np.sin(2 * np.pi * 0.5 * t) > -0.3).astype(np.float32)   # konuşma / sessizlik
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(t.size)
+    return (signal * envelope * 32767 * 0.5).astype(np.int16)
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024   # Linux: KB
+
+
+def run_engine(engine, model_size, threads, media, seconds):
+    """Tek motoru bu süreçte ölçer (alt süreç olarak çağrılır)."""
+    pcm = extract_pcm(media) if media else synthetic_pcm(seconds)
+    duration = len(pcm) / SAMPLE_RATE
+    rss_before = peak_rss_mb()
+
+    start = time.perf_counter()
+    backend = load_backend(engine, model_size, threads)
+    load_s = time.perf_counter() - start
+    rss_loaded = peak_rss_mb()
+
+    start = time.perf_counter()
+    res = backend.transcribe(pcm)
+    transcribe_s = time.perf_counter() - start
+
+    return {
+        "engine": engine,
+        "model": model_size,
+        "threads": threads,
+        "audio_s": round(duration, 1),
+        "load_s": round(load_s, 2),
+        "transcribe_s": round(transcribe_s, 2),
+        "rtf": round(transcribe_s / duration, 3),
+        "model_rss_mb": round(rss_loaded - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "chars": len(res['text']),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transkripsiyon motoru karşılaştırması")
+    parser.add_argument("--media", help="ölçülecek video/ses dosyası (yoksa sentetik ses)")
+    parser.add_argument("--seconds", type=float, default=60, help="sentetik ses süresi")
+    parser.add_argument("--model", default=ASR_MODEL)
+    parser.add_argument("--threads", type=int, default=ASR_THREADS)
+    parser.add_argument("--engines", nargs="+", default=list(BACKENDS))
+    parser.add_argument("--json", action="store_true", help="sonucu makine okunur JSON olarak yaz")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_engine(args.child, args.model, args.threads, args.media, args.seconds)))
+        return
+
+    results = []
+    for engine in args.engines:
+        cmd = [sys.executable, os.path.abspath(__file__), "--child", engine, "--model", args.model,
+               "--threads", str(args.threads), "--seconds", str(args.seconds)]
+        if args.media:
+            cmd += ["--media", args.media]
+        proc = subprocess.run(cmd, capture_output=True, text=True)
+        if proc.returncode != 0:
+            err = proc.stderr.strip().splitlines()
+            results.append({"engine": engine, "error": err[-1] if err else "bilinmeyen hata"})
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, ensure_ascii=False, indent=2))
+        return
+
+    print(f"{'Motor':<16} {'Yükleme':>9} {'Süre':>9} {'RTF':>7} {'Model RSS':>11} {'Tepe RSS':>10}")
+    for r in results:
+        if "error" in r:
+            print(f"{r['engine']:<16} HATA: {r['error']}")
+            continue
+        print(f"{r['engine']:<16} {r['load_s']:>8.2f}s {r['transcribe_s']:>8.2f}s {r['rtf']:>7.3f}"
+              f" {r['model_rss_mb']:>9.0f}MB {r['peak_rss_mb']:>8.0f}MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# --- BENCHMARK: SOĞUK BAŞLANGIÇ / IMPORT SÜRESİ ---
+# app3.py'nin modül seviyesindeki import'larını temiz bir yorumlayıcıda çalıştırıp
+# süresini ölçer ve ağır kütüphanelerden (whisper/torch, plotly, fpdf, firebase,
+# openai, genai) hangisinin başlangıçta yüklendiğini raporlar. Süre bütçeyi aşar
+# ya da ağır bir kütüphane başlangıca sızarsa çıkış kodu 1 olur (CI için).
+# Kullanım: python benchmarks/bench_import_time.py [--budget SN] [--repeat N] [--lazy]
+import os
+import re
+import sys
+import ast
+import json
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "app3.py")
+
+IMPORT_BUDGET_S = float(os.environ.get("IMPORT_BUDGET_S", "3.0"))
+
+# Öğrenci oturumunun açılışında yüklenmemesi gereken modüller
+HEAVY_MODULES = [
+    "whisper", "torch", "faster_whisper", "ctranslate2", "plotly", "fpdf",
+    "firebase_admin", "google.cloud.firestore", "openai", "google.generativeai",
+]
+
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+missing = []
+for stmt in {stmts!r}:
+    try:
+        exec(stmt, {{}})
+    except ImportError as e:
+        missing.append(str(e))
+elapsed = time.perf_counter() - start
+heavy = [m for m in {heavy!r} if m in sys.modules]
+print(json.dumps({{"seconds": elapsed, "heavy": heavy, "missing": missing, "modules": len(sys.modules)}}))
+"""
+
+_IMPORTTIME = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def top_level_imports(path=APP):
+    """Dosyanın modül seviyesindeki (fonksiyon içi olmayan) import satırları."""
+    with open(path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    return [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+
+
+def probe(stmts, importtime=False):
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ["-X", "importtime"]
+    code = _PROBE.format(stmts=stmts, heavy=HEAVY_MODULES)
+    proc = subprocess.run(cmd + ["-c", code], cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr else "probe başarısız")
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def slowest_packages(importtime_log, top=10):
+    """-X importtime çıktısından en pahalı üst seviye paketler (kümülatif, sn)."""
+    totals = {}
+    for line in importtime_log.splitlines():
+        m = _IMPORTTIME.match(line)
+        if m and len(m.group(3)) == 1:   # Girintisiz = doğrudan import edilen paket
+            totals[m.group(4)] = totals.get(m.group(4), 0) + int(m.group(2)) / 1e6
+    return sorted(totals.items(), key=lambda kv: kv[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="app3.py soğuk başlangıç ölçümü")
+    parser.add_argument("--budget", type=float, default=IMPORT_BUDGET_S, help="izin verilen başlangıç süresi (sn)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--lazy", action="store_true", help="ertelenen ağır kütüphanelerin tek tek maliyetini de ölç")
+    parser.add_argument("--json", action="store_true", help="sonucu makine okunur JSON olarak yaz")
+    args = parser.parse_args()
+
+    stmts = top_level_imports()
+    runs = [probe(stmts)[0] for _ in range(args.repeat)]
+    best = min(r["seconds"] for r in runs)
+    result, log = probe(stmts, importtime=True)
+    # Streamlit'in kendi yüklediği modüller (ör. plotly teması) uygulamaya yazılmaz
+    baseline, _ = probe(["import streamlit"])
+    heavy = [m for m in result["heavy"] if m not in baseline["heavy"]]
+
+    report = {
+        "startup_s": round(best, 4),
+        "budget_s": args.budget,
+        "modules_loaded": result["modules"],
+        "heavy_at_startup": heavy,
+        "heavy_from_streamlit": baseline["heavy"],
+        "missing": result["missing"],
+        "slowest": [{"package": p, "seconds": round(s, 4)} for p, s in slowest_packages(log)],
+    }
+    if args.lazy:
+        lazy = {}
+        for mod in HEAVY_MODULES:
+            r, _ = probe([f"import {mod}"])
+            lazy[mod] = None if r["missing"] else round(r["seconds"], 4)
+        report["deferred"] = lazy
+
+    ok = best <= args.budget and not heavy
+
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        print(f"app3.py başlangıç import'ları      : {best * 1000:8.1f} ms (bütçe {args.budget * 1000:.0f} ms)")
+        print(f"Yüklenen modül sayısı              : {result['modules']}")
+        print(f"Başlangıçta yüklenen ağır modüller : {', '.join(heavy) or '-'}")
+        if baseline["heavy"]:
+            print(f"  (streamlit'in kendisi yükler     : {', '.join(baseline['heavy'])})")
+        if result["missing"]:
+            print(f"Bu ortamda eksik                   : {'; '.join(result['missing'])}")
+        print("En pahalı paketler:")
+        for item in report["slowest"]:
+            print(f"  {item['package']:<30} {item['seconds'] * 1000:8.1f} ms")
+        if args.lazy:
+            print("İlk kullanıma ertelenen maliyet:")
+            for mod, sec in report["deferred"].items():
+                print(f"  {mod:<30} " + ("kurulu değil" if sec is None else f"{sec * 1000:8.1f} ms"))
+        print("SONUÇ: " + ("bütçe içinde" if ok else "BÜTÇE AŞILDI"))
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
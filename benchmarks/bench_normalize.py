@@ -0,0 +1,61 @@
+# --- BENCHMARK: SONUÇ NORMALİZASYONU ---
+# 100k sentetik sınav kaydında şema normalizasyonunun maliyetini ölçer.
+# Kullanım: python benchmarks/bench_normalize.py [satır sayısı]
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from results import format_data_for_csv, migrate_record
+
+
+def synthetic_records(n, legacy_ratio=0.3, seed=42):
+    """Gerçek koleksiyona benzer karışık kayıtlar: bir kısmı eski alan adlarıyla."""
+    rng = random.Random(seed)
+    records = []
+    for i in range(n):
+        r = {'ad_soyad': f"Öğrenci {i % 5000}", 'no': str(100000 + i)}
+        if rng.random() < legacy_ratio:
+            r['on_test_puan'] = rng.randint(0, 15)
+            r['son_test_puan'] = str(rng.randint(0, 15))   # eski kayıtlarda metin puan da var
+        else:
+            r['on_test'] = rng.randint(0, 15)
+            r['son_test'] = rng.randint(0, 15)
+            r['toplam_soru'] = 15
+        records.append(r)
+    return records
+
+
+def timed(fn, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main(n=100_000):
+    records = synthetic_records(n)
+
+    t_migrate, migrated = timed(lambda: [migrate_record(r) for r in records], repeat=1)
+    t_raw, table = timed(lambda: format_data_for_csv(pd.DataFrame(records), 15))
+    t_canon, table2 = timed(lambda: format_data_for_csv(pd.DataFrame(migrated), 15))
+    assert table.equals(table2)
+
+    legacy_mb = pd.DataFrame(records).memory_usage(deep=True).sum() / 1e6
+    table_mb = table.memory_usage(deep=True).sum() / 1e6
+
+    print(f"Satır sayısı                         : {n:,}")
+    print(f"Tek seferlik göç (migrate_record)    : {t_migrate * 1000:8.1f} ms")
+    print(f"Normalizasyon, ham/eski kayıtlar     : {t_raw * 1000:8.1f} ms")
+    print(f"Normalizasyon, göç edilmiş kayıtlar  : {t_canon * 1000:8.1f} ms")
+    print(f"Bellek: ham DataFrame {legacy_mb:.1f} MB -> tipli tablo {table_mb:.1f} MB")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
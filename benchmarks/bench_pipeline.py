@@ -0,0 +1,336 @@
+# --- BENCHMARK: DERS HATTI (ÇEVRİMDIŞI) ---
+# API kredisi harcamadan tüm hattın aşamalarını ölçer: ffmpeg ile üretilen
+# sentetik ders videosu, Gemini/OpenAI/Firestore için bellek içi taklitler
+# (bkz. fakes.py). Sonuçlar JSON dosyasına yazılır; --compare ile önceki bir
+# koşuyla karşılaştırılıp gerilemeler işaretlenir (çıkış kodu 1).
+# Kullanım:
+#   python benchmarks/bench_pipeline.py [--out sonuc.json] [--compare onceki.json] [--quick]
+#   python benchmarks/bench_pipeline.py --only pdf csv
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# Önbellekler geçici klasöre yazılsın; gerçek .cache kirlenmesin, her koşu soğuk başlasın
+_SCRATCH = tempfile.mkdtemp(prefix="bench_")
+os.environ["CACHE_DIR"] = os.path.join(_SCRATCH, "cache")
+
+import fakes
+
+fakes.install()
+
+import pandas as pd
+
+from analysis import analyze_full_text_with_gemini, parse_response
+from report import render_study_pdf
+from results import ResultsStore, format_data_for_csv, save_batch_with_aggregate
+from transcription import SAMPLE_RATE, extract_pcm
+from bench_normalize import synthetic_records
+
+REGRESSION_RATIO = 1.25   # --compare: bundan fazla yavaşlayan ölçüm gerileme sayılır
+
+
+# --- YARDIMCILAR ---
+def measure(fn, repeat=3, warmup=1):
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return {'best_s': round(min(times), 5), 'mean_s': round(statistics.mean(times), 5), 'repeat': repeat}
+
+
+def synthetic_video(path, seconds):
+    """Konuşma/sessizlik sırası taklit eden ses + siyah görüntülü MP4 (ffmpeg lavfi)."""
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"sine=frequency=220:sample_rate=44100:duration={seconds}",
+        "-f", "lavfi", "-i", f"color=c=black:s=320x240:r=10:d={seconds}",
+        "-af", "tremolo=f=0.3:d=0.95", "-shortest",
+        "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", path,
+    ]
+    subprocess.run(command, check=True)
+    return path
+
+
+def synthetic_transcript(chars):
+    cumle = "Bugün derste hücre zarının yapısını ve madde geçişlerini örneklerle inceledik. "
+    return (cumle * (chars // len(cumle) + 1))[:chars]
+
+
+# --- AŞAMALAR ---
+def bench_audio(quick):
+    if shutil.which("ffmpeg") is None:
+        return [{'name': 'sesi_sokup_al', 'skipped': "ffmpeg bulunamadı"}]
+    out = []
+    for seconds in ([30] if quick else [60, 600]):
+        video = synthetic_video(os.path.join(_SCRATCH, f"ders_{seconds}.mp4"), seconds)
+        r = measure(lambda: extract_pcm(video), repeat=2 if quick else 3)
+        out.append({'name': 'sesi_sokup_al', 'params': {'seconds': seconds}, **r,
+                    'rtf': round(r['best_s'] / seconds, 5)})
+    return out
+
+
+def bench_transcribe(quick):
+    from asr import BACKENDS, load_backend
+    seconds = 30 if quick else 120
+    pcm = synthetic_pcm(seconds)
+    out = []
+    for engine in BACKENDS:
+        try:
+            backend = load_backend(engine, "tiny" if quick else "base")
+        except ImportError as e:
+            out.append({'name': 'transcribe', 'params': {'engine': engine}, 'skipped': str(e)})
+            continue
+        r = measure(lambda: backend.transcribe(pcm), repeat=1, warmup=0)
+        out.append({'name': 'transcribe', 'params': {'engine': engine, 'seconds': seconds}, **r,
+                    'rtf': round(r['best_s'] / seconds, 4)})
+    return out
+
+
+def synthetic_pcm(seconds):
+    import numpy as np
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) * (np.sin(2 * np.pi * 0.3 * t) > 0)
+    return (signal * 32767).astype(np.int16)
+
+
+def synthetic_lecture(seconds, seed):
+    """Konuşma patlamaları + log-normal uzunlukta duraklamalar (gürültü tabanında)."""
+    import numpy as np
+    rng = np.random.default_rng(seed)
+    parts, t = [], 0.0
+    while t < seconds:
+        speech = rng.uniform(0.2, 4.0)
+        pause = rng.lognormal(np.log(0.35), 0.7)
+        parts.append(rng.standard_normal(int(speech * SAMPLE_RATE)) * rng.uniform(400, 4000))
+        parts.append(rng.standard_normal(int(pause * SAMPLE_RATE)) * 30)
+        t += speech + pause
+    return np.clip(np.concatenate(parts), -32768, 32767).astype(np.int16)
+
+
+def bench_analysis(quick):
+    out = []
+    # Ağ gecikmesi sıfır: ölçülen, istem kurma + JSON ayrıştırma + konu birleştirme maliyeti
+    for chars in ([5000, 30000] if quick else [5000, 30000, 200000]):
+        text = synthetic_transcript(chars)
+        r = measure(lambda: analyze_full_text_with_gemini(text), repeat=3)
+        out.append({'name': 'analyze_full_text_with_gemini', 'params': {'chars': chars}, **r})
+    response = fakes.FakeGenerativeModel("bench").generate_content("x" * 18000).text
+    out.append({'name': 'parse_response', 'params': {'chars': len(response)}, **measure(lambda: parse_response(response), repeat=20)})
+    return out
+
+
+def bench_pdf(quick):
+    out = []
+    for n in ([10] if quick else [10, 40]):
+        data = fakes.fake_topics(n)
+        mistakes = set(range(0, n, 2))
+        for include_extra in (False, True):
+            r = measure(lambda: render_study_pdf(data, mistakes, include_extra), repeat=3)
+            out.append({'name': 'create_study_pdf', 'params': {'topics': n, 'include_extra': include_extra}, **r,
+                        'bytes': len(render_study_pdf(data, mistakes, include_extra))})
+    return out
+
+
+def bench_csv(quick):
+    out = []
+    for n in ([1000, 10000] if quick else [1000, 10000, 100000]):
+        df = pd.DataFrame(synthetic_records(n))
+        out.append({'name': 'format_data_for_csv', 'params': {'rows': n}, **measure(lambda: format_data_for_csv(df, 15))})
+    return out
+
+
+def bench_tts(quick):
+    import tts
+    client = fakes.FakeOpenAI()
+    texts = [t['ozet'] for t in fakes.fake_topics(5 if quick else 20)]
+    texts = [f"{i}. {t}" for i, t in enumerate(texts)]   # Hepsi farklı anahtar
+    start = time.perf_counter()
+    for text in texts:
+        tts.synthesize(client, text, 1.0)
+    cold = time.perf_counter() - start
+    warm = measure(lambda: [tts.synthesize(client, text, 1.0) for text in texts], repeat=3)
+    out = [
+        {'name': 'generate_audio_openai', 'params': {'texts': len(texts), 'cache': 'cold'}, 'best_s': round(cold, 5), 'mean_s': round(cold, 5), 'repeat': 1},
+        {'name': 'generate_audio_openai', 'params': {'texts': len(texts), 'cache': 'warm'}, **warm},
+    ]
+
+    # İlk sese kadar geçen süre: tek istek vs. cümle parçaları (süre metin uzunluğuyla artan API taklidi)
+    slow = fakes.FakeOpenAI()
+    slow.latency, slow.latency_per_char = 0.05, 0.0005
+    for chars in ([1000] if quick else [1000, 4000]):
+        text = " ".join(f"{i}. cümle bu konuda anlatılan örneği açıklar." for i in range(chars // 45))
+        for mode in ('single', 'chunked'):
+            variant = f"{mode} {time.perf_counter_ns()} {text}"   # Soğuk önbellek
+            start = time.perf_counter()
+            if mode == 'single':
+                tts.synthesize(slow, variant, 1.0)
+                first = total = time.perf_counter() - start
+            else:
+                parts = tts.synthesize_chunks(slow, variant, 1.0)
+                next(parts)
+                first = time.perf_counter() - start
+                for _ in parts:
+                    pass
+                total = time.perf_counter() - start
+            out.append({'name': 'tts_ilk_ses', 'params': {'chars': len(text), 'mode': mode},
+                        'best_s': round(first, 5), 'mean_s': round(first, 5), 'repeat': 1, 'total_s': round(total, 5)})
+    return out
+
+
+def bench_firestore(quick):
+    db = fakes.fake_db()
+    out = []
+    records = synthetic_records(200 if quick else 2000)
+    for r in records:
+        r['no'] = str(r['no'])
+    batches = [records[i:i + 100] for i in range(0, len(records), 100)]
+    r = measure(lambda: [save_batch_with_aggregate(db, b) for b in batches], repeat=1, warmup=0)
+    out.append({'name': 'save_results_to_firebase', 'params': {'records': len(records), 'batch': 100}, **r})
+
+    def sync_cold():
+        store = ResultsStore(os.path.join(_SCRATCH, f"sync_{time.perf_counter_ns()}.sqlite"))
+        return store.sync(db)
+    out.append({'name': 'get_class_data_from_firebase', 'params': {'records': len(records), 'sync': 'full'}, **measure(sync_cold, repeat=3)})
+    return out
+
+
+def bench_incremental(quick):
+    """Ortasındaki 3 dakikası yeniden çekilip yüklenen ders: ne kadarı yeniden işlenir?"""
+    import numpy as np
+    from cache import DiskCache
+    from transcription import SegmentIndex, fingerprint, split_stable
+    seconds = 1200 if quick else 3600
+    original = synthetic_lecture(seconds, seed=1)
+    at = seconds // 2 * SAMPLE_RATE
+    edited = np.concatenate([original[:at], synthetic_lecture(180, seed=2), original[at + 180 * SAMPLE_RATE:]])
+    # Yeniden kodlama taklidi: küçük kazanç farkı + gürültü
+    edited = np.clip(edited * 0.97 + np.random.default_rng(3).standard_normal(len(edited)) * 15, -32768, 32767).astype(np.int16)
+
+    cache = DiskCache(os.path.join(_SCRATCH, "incremental"))
+    index = SegmentIndex()
+    out = []
+    for upload, pcm in (('first', original), ('edited', edited)):
+        start = time.perf_counter()
+        bounds = split_stable(pcm)
+        fps = [fingerprint(pcm[s:e]) for s, e in bounds]
+        hits = [index.find(fp) for fp in fps]
+        elapsed = time.perf_counter() - start
+        # Transkripsiyon taklidi: eşleşmeyen parçaya yeni metin (~15 karakter/sn)
+        entries = [hit or {'fp': fp, 'text': f"[{upload} {i}] " + synthetic_transcript(int((e - s) / SAMPLE_RATE * 15))}
+                   for i, ((s, e), fp, hit) in enumerate(zip(bounds, fps, hits))]
+        index.add([entry for entry, hit in zip(entries, hits) if hit is None])
+        texts = [entry['text'] for entry in entries]
+        calls = fakes.FakeGenerativeModel.calls
+        analyze_full_text_with_gemini(" ".join(texts), segments=texts, cache=cache)
+        out.append({'name': 'incremental', 'params': {'seconds': seconds, 'upload': upload},
+                    'best_s': round(elapsed, 5), 'mean_s': round(elapsed, 5), 'repeat': 1,
+                    'segments': len(bounds), 'reused_segments': sum(hit is not None for hit in hits),
+                    'transcribe_audio_s': round(sum(e - s for (s, e), hit in zip(bounds, hits) if hit is None) / SAMPLE_RATE, 1),
+                    'gemini_requests': fakes.FakeGenerativeModel.calls - calls})
+    return out
+
+
+SUITES = {
+    'audio': bench_audio,
+    'transcribe': bench_transcribe,
+    'analysis': bench_analysis,
+    'pdf': bench_pdf,
+    'csv': bench_csv,
+    'tts': bench_tts,
+    'firestore': bench_firestore,
+    'incremental': bench_incremental,
+}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def _key(r):
+    return r['name'] + json.dumps(r.get('params', {}), sort_keys=True)
+
+
+def compare(results, baseline_path, ratio=REGRESSION_RATIO):
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {_key(r): r for r in json.load(f)['results'] if 'best_s' in r}
+    regressions = []
+    print(f"\n{'Ölçüm':<60} {'önceki':>10} {'şimdi':>10} {'oran':>7}")
+    for r in results:
+        old = baseline.get(_key(r))
+        if 'best_s' not in r or old is None:
+            continue
+        oran = r['best_s'] / old['best_s'] if old['best_s'] else float('inf')
+        flag = " ⚠️" if oran > ratio else ""
+        if flag:
+            regressions.append(_key(r))
+        print(f"{_key(r)[:60]:<60} {old['best_s']:>10.4f} {r['best_s']:>10.4f} {oran:>6.2f}x{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Çevrimdışı ders hattı benchmark'ı")
+    parser.add_argument("--out", default=os.path.join(ROOT, "bench_output.json"))
+    parser.add_argument("--compare", help="önceki koşunun JSON çıktısı")
+    parser.add_argument("--only", nargs="+", choices=list(SUITES))
+    parser.add_argument("--quick", action="store_true", help="küçük boyutlarla hızlı koşu")
+    args = parser.parse_args()
+
+    results = []
+    try:
+        for name in args.only or SUITES:
+            start = time.perf_counter()
+            try:
+                suite = SUITES[name](args.quick)
+            except Exception as e:
+                suite = [{'name': name, 'error': f"{type(e).__name__}: {e}"}]
+            results.extend(suite)
+            print(f"[{name}] {time.perf_counter() - start:.1f} sn")
+            for r in suite:
+                if 'best_s' in r:
+                    print(f"  {_key(r):<70} {r['best_s'] * 1000:10.2f} ms")
+                else:
+                    print(f"  {_key(r):<70} {r.get('skipped') or r.get('error')}")
+    finally:
+        shutil.rmtree(_SCRATCH, ignore_errors=True)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'quick': args.quick,
+        },
+        'results': results,
+    }
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nSonuçlar: {args.out}")
+
+    if args.compare:
+        regressions = compare(results, args.compare)
+        if regressions:
+            print(f"\n{len(regressions)} ölçümde gerileme var.")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,328 @@
+# --- ÇEVRİMDIŞI YEDEKLER (FAKE) ---
+# Benchmark ve yük testleri API kredisi harcamadan çalışsın diye Gemini,
+# OpenAI TTS ve Firestore'un bellek içi taklitleri. install() bunları
+# sys.modules'e gerçek paket adlarıyla yerleştirir; böylece app3.py ve
+# modüller hiç değişmeden bu taklitlerle çalışır. Gecikmeler saniye cinsindendir
+# ve gerçek ağ gidiş-dönüşünü taklit etmek için ayarlanabilir.
+import sys
+import json
+import time
+import types
+import random
+import threading
+from datetime import datetime, timezone
+
+# --- GEMINI ---
+_TOPIC_WORDS = ["Hücre", "Enerji", "Kuvvet", "Denge", "Tepkime", "Dalga", "Atom", "Fonksiyon", "Türev", "Olasılık"]
+
+
+def fake_topics(n, seed=0, ozet_chars=600, ek_chars=900):
+    """Gemini çıktısı biçiminde sentetik ders konuları."""
+    rng = random.Random(seed)
+    cumle = "Bu konu ders videosunda örneklerle ve şekillerle ayrıntılı olarak anlatılmıştır. "
+    items = []
+    for i in range(n):
+        baslik = f"{rng.choice(_TOPIC_WORDS)} ve {rng.choice(_TOPIC_WORDS)} {i + 1}"
+        items.append({
+            "alt_baslik": baslik,
+            "ozet": (cumle * (ozet_chars // len(cumle) + 1))[:ozet_chars],
+            "ek_bilgi": (cumle * (ek_chars // len(cumle) + 1))[:ek_chars],
+            "soru_data": {
+                "soru": f"{baslik} ile ilgili hangisi doğrudur?",
+                "A": "Birinci şık", "B": "İkinci şık", "C": "Üçüncü şık", "D": "Dördüncü şık",
+                "dogru_sik": "ABCD"[i % 4],
+            },
+        })
+    return items
+
+
+class FakeUsage:
+    def __init__(self, prompt, text):
+        self.prompt_token_count = len(prompt) // 4
+        self.candidates_token_count = len(text) // 4
+        self.total_token_count = self.prompt_token_count + self.candidates_token_count
+
+
+class FakeGeminiResponse:
+    def __init__(self, prompt, text):
+        self.text = text
+        self.usage_metadata = FakeUsage(prompt, text)
+
+
+class FakeGenerativeModel:
+    """Metin uzunluğuna göre konu sayısı üreten, markdown çitli JSON döndüren model."""
+    latency = 0.0
+    chars_per_topic = 1500
+    calls = 0
+
+    def __init__(self, name):
+        self.name = name
+
+    def generate_content(self, prompt):
+        FakeGenerativeModel.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        n = max(1, min(12, len(prompt) // self.chars_per_topic))
+        body = json.dumps(fake_topics(n, seed=len(prompt)), ensure_ascii=False, indent=2)
+        return FakeGeminiResponse(prompt, f"İşte analiz:\n```json\n{body}\n```")
+
+
+# --- OPENAI TTS ---
+# MPEG-1 Layer III, 128 kbps, 44.1 kHz çerçeve başlığı; çerçeve 417 bayt (~26 ms)
+MP3_FRAME = b"\xff\xfb\x90\x64" + bytes(413)
+CHARS_PER_SECOND = 15
+
+
+def fake_mp3(text, speed=1.0):
+    """Metnin okunma süresine denk uzunlukta, geçerli çerçevelerden oluşan MP3 baytları."""
+    seconds = max(0.5, len(text) / CHARS_PER_SECOND / float(speed))
+    return MP3_FRAME * int(seconds / 0.026)
+
+
+class _FakeSpeechResponse:
+    def __init__(self, content):
+        self.content = content
+
+
+class _FakeSpeech:
+    def __init__(self, owner):
+        self.owner = owner
+
+    def create(self, model, voice, input, speed=1.0, **kwargs):
+        with self.owner._lock:
+            self.owner.calls += 1
+        if self.owner.latency:
+            # Gerçek API'de süre metin uzunluğuyla artar
+            time.sleep(self.owner.latency + len(input) * self.owner.latency_per_char)
+        return _FakeSpeechResponse(fake_mp3(input, speed))
+
+
+class FakeOpenAI:
+    latency = 0.0
+    latency_per_char = 0.0
+
+    def __init__(self, api_key=None, **kwargs):
+        self.calls = 0
+        self._lock = threading.Lock()
+        self.audio = types.SimpleNamespace(speech=_FakeSpeech(self))
+
+
+# --- FIRESTORE ---
+SERVER_TIMESTAMP = object()
+
+
+class FieldFilter:
+    def __init__(self, field_path, op_string, value):
+        self.field, self.op, self.value = field_path, op_string, value
+
+    def matches(self, data):
+        v = data.get(self.field)
+        if v is None:
+            return False
+        return {'>=': v >= self.value, '>': v > self.value, '==': v == self.value,
+                '<=': v <= self.value, '<': v < self.value}[self.op]
+
+
+class FieldPath:
+    DOCUMENT_ID = "__name__"
+
+    @staticmethod
+    def document_id():
+        return FieldPath.DOCUMENT_ID
+
+
+class FakeSnapshot:
+    def __init__(self, doc_id, data, fields=None):
+        self.id = doc_id
+        self.exists = data is not None
+        if data is not None and fields is not None:
+            data = {k: v for k, v in data.items() if k in fields}
+        self._data = data
+
+    def to_dict(self):
+        return None if self._data is None else dict(self._data)
+
+
+class FakeDocumentRef:
+    def __init__(self, db, collection, doc_id):
+        self._db, self._collection, self.id = db, collection, doc_id
+
+    def get(self, transaction=None):
+        self._db._rtt()
+        with self._db._lock:
+            data = self._db._data.get(self._collection, {}).get(self.id)
+            return FakeSnapshot(self.id, None if data is None else dict(data))
+
+    def set(self, data):
+        self._db._rtt()
+        self._db._apply([(self, data)])
+
+
+class FakeQuery:
+    def __init__(self, db, collection, fields=None, filters=(), order=None, limit=None, after=None):
+        self._db, self._collection = db, collection
+        self._fields, self._filters, self._order, self._limit, self._after = fields, filters, order, limit, after
+
+    def _copy(self, **kw):
+        args = dict(fields=self._fields, filters=self._filters, order=self._order, limit=self._limit, after=self._after)
+        args.update(kw)
+        return FakeQuery(self._db, self._collection, **args)
+
+    def select(self, fields):
+        return self._copy(fields=set(fields))
+
+    def where(self, filter):
+        return self._copy(filters=self._filters + (filter,))
+
+    def order_by(self, field):
+        return self._copy(order=field)
+
+    def limit(self, n):
+        return self._copy(limit=n)
+
+    def start_after(self, snapshot):
+        return self._copy(after=snapshot)
+
+    def _key(self, item):
+        doc_id, data = item
+        if self._order in (None, FieldPath.DOCUMENT_ID):
+            return (doc_id,)
+        return (data.get(self._order), doc_id)
+
+    def stream(self):
+        self._db._rtt()
+        with self._db._lock:
+            items = [(i, dict(d)) for i, d in self._db._data.get(self._collection, {}).items()]
+        items = [it for it in items if all(f.matches(it[1]) for f in self._filters)]
+        items.sort(key=self._key)
+        if self._after is not None:
+            last = self._key((self._after.id, self._after.to_dict() or {}))
+            items = [it for it in items if self._key(it) > last]
+        if self._limit is not None:
+            items = items[:self._limit]
+        for doc_id, data in items:
+            yield FakeSnapshot(doc_id, data, self._fields)
+
+
+class FakeCollection(FakeQuery):
+    def __init__(self, db, name):
+        super().__init__(db, name)
+
+    def document(self, doc_id):
+        return FakeDocumentRef(self._db, self._collection, str(doc_id))
+
+
+class FakeWriteBatch:
+    def __init__(self, db):
+        self._db = db
+        self._writes = []
+
+    def set(self, ref, data):
+        self._writes.append((ref, data))
+
+    def commit(self):
+        self._db._rtt()
+        self._db._apply(self._writes)
+        self._writes = []
+
+
+class FakeTransaction(FakeWriteBatch):
+    pass
+
+
+class FakeFirestore:
+    """Tek süreçlik bellek içi Firestore. Transaction'lar tek kilitle sıralanır."""
+    latency = 0.0
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._tx_lock = threading.Lock()
+        self._data = {}
+        self.writes = 0
+
+    def _rtt(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    def _apply(self, writes):
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for ref, data in writes:
+                data = {k: (now if v is SERVER_TIMESTAMP else v) for k, v in data.items()}
+                self._data.setdefault(ref._collection, {})[ref.id] = data
+                self.writes += 1
+
+    def collection(self, name):
+        return FakeCollection(self, name)
+
+    def get_all(self, refs, transaction=None):
+        self._rtt()
+        with self._lock:
+            return [FakeSnapshot(r.id, self._data.get(r._collection, {}).get(r.id)) for r in refs]
+
+    def transaction(self):
+        return FakeTransaction(self)
+
+    def batch(self):
+        return FakeWriteBatch(self)
+
+    def count(self, collection):
+        with self._lock:
+            return len(self._data.get(collection, {}))
+
+
+def transactional(fn):
+    def run(transaction):
+        # Gerçek Firestore iyimser kilitleme yapar; taklitte transaction'lar sıraya girer
+        with transaction._db._tx_lock:
+            result = fn(transaction)
+            transaction.commit()
+            return result
+    return run
+
+
+# --- KURULUM ---
+_db = FakeFirestore()
+
+
+def fake_db():
+    return _db
+
+
+def _module(name, **attrs):
+    mod = types.ModuleType(name)
+    mod.__dict__.update(attrs)
+    return mod
+
+
+def install(gemini_latency=0.0, tts_latency=0.0, tts_latency_per_char=0.0, firestore_latency=0.0):
+    """Taklit modülleri sys.modules'e yerleştirir. Gerçek paketler yüklüyse de onların yerine geçer."""
+    FakeGenerativeModel.latency = gemini_latency
+    FakeOpenAI.latency = tts_latency
+    FakeOpenAI.latency_per_char = tts_latency_per_char
+    FakeFirestore.latency = firestore_latency
+
+    genai = _module("google.generativeai", configure=lambda **kw: None, GenerativeModel=FakeGenerativeModel)
+    openai = _module("openai", OpenAI=FakeOpenAI)
+    firestore = _module(
+        "firebase_admin.firestore",
+        client=fake_db, transactional=transactional, SERVER_TIMESTAMP=SERVER_TIMESTAMP,
+        FieldFilter=FieldFilter, FieldPath=FieldPath,
+    )
+    credentials = _module("firebase_admin.credentials", Certificate=lambda info: info)
+    firebase_admin = _module("firebase_admin", _apps={}, credentials=credentials, firestore=firestore)
+    firebase_admin.initialize_app = lambda cred=None, **kw: firebase_admin._apps.setdefault("[DEFAULT]", cred)
+
+    sys.modules.update({
+        "google.generativeai": genai,
+        "openai": openai,
+        "firebase_admin": firebase_admin,
+        "firebase_admin.credentials": credentials,
+        "firebase_admin.firestore": firestore,
+    })
+    try:
+        import google
+        google.generativeai = genai
+    except ImportError:
+        sys.modules["google"] = _module("google", generativeai=genai, __path__=[])
+    return _db
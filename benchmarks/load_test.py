@@ -0,0 +1,272 @@
+# --- YÜK TESTİ: SINIFÇA AYNI ANDA SINAV ---
+# N öğrenciyi tek Streamlit sunucusundaymış gibi aynı süreçte, eşzamanlı
+# AppTest oturumlarıyla 2 -> 3 -> 4. adımlardan geçirir: giriş, ön test
+# formu, PDF planı + TTS dinleme, son test gönderimi. Firestore ve OpenAI
+# yerine bellek içi taklitler kullanılır (bkz. fakes.py); gecikmeleri
+# ayarlanarak gerçek ağ koşulları taklit edilebilir.
+# Rapor: adım başına gecikme yüzdelikleri, oturum başına RSS ve verim.
+# AppTest tek oturum için tasarlandığından, oturumların gerçek sunucudaki
+# gibi tek bir çalışma zamanını (medya dosyaları, önbellek, secrets)
+# paylaşması için share_runtime() küresel durumu bir kez kurar.
+# Kullanım:
+#   python benchmarks/load_test.py --students 40 [--ramp 5] [--think 0.5] [--json sonuc.json]
+import os
+import sys
+import json
+import time
+import random
+import logging
+import argparse
+import tempfile
+import threading
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+_SCRATCH = tempfile.mkdtemp(prefix="loadtest_")
+os.environ["CACHE_DIR"] = os.path.join(_SCRATCH, "cache")
+os.environ["LESSON_DIR"] = os.path.join(_SCRATCH, "lessons")
+
+import fakes
+
+APP = os.path.join(ROOT, "app3.py")
+SECRETS = {
+    "gemini_key": "fake", "openai_key": "fake", "admin_password": "fake",
+    "firebase": {"private_key": "fake\\nkey", "project_id": "load-test"},
+}
+STEPS = ["giris", "on_test", "pdf", "tts", "son_teste_gec", "son_test"]
+
+
+def rss_mb():
+    """Sürecin şu anki RSS'i (Linux /proc); yoksa tepe değer."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def share_runtime():
+    """
+    AppTest her koşuda küresel Runtime/ScriptCache/secrets/config kurup geri
+    alır; eşzamanlı oturumlarda bunlar birbirini ezer. Gerçek sunucudaki gibi
+    tek bir ortak çalışma zamanı kurulur ve AppTest'in koşu başı kurulumu
+    etkisiz bırakılır. Ortak MediaFileManager sayesinde ertelenmiş
+    download_button verisi (PDF) de gerçek yolundan çağrılabilir.
+    """
+    import contextlib
+    from unittest.mock import MagicMock
+    import streamlit as st
+    from streamlit import config
+    from streamlit.runtime import Runtime
+    from streamlit.runtime.caching.storage.dummy_cache_storage import MemoryCacheStorageManager
+    from streamlit.runtime.dataframe_source_manager import DataframeSourceManager
+    from streamlit.runtime.media_file_manager import MediaFileManager
+    from streamlit.runtime.memory_media_file_storage import MemoryMediaFileStorage
+    from streamlit.runtime.scriptrunner.script_cache import ScriptCache
+    from streamlit.runtime.secrets import Secrets
+    from streamlit.testing.v1 import app_test, local_script_runner
+
+    runtime = MagicMock(spec=Runtime)
+    runtime.media_file_mgr = MediaFileManager(MemoryMediaFileStorage("/mock/media"))
+    runtime.dataframe_source_mgr = DataframeSourceManager()
+    runtime.cache_storage_manager = MemoryCacheStorageManager()
+    Runtime._instance = runtime
+    # AppTest'in koşu başı Runtime._instance atamaları bu boş sınıfa gider
+    app_test.Runtime = type("RuntimeShim", (), {"_instance": None})
+
+    # Script bir kez derlenir (eşzamanlı ast.parse CPython'da güvenli değil)
+    script_cache = ScriptCache()
+    app_test.ScriptCache = local_script_runner.ScriptCache = lambda: script_cache
+
+    # Her öğrenci ayrı oturum kimliği taşısın; yoksa medya dosyaları (PDF,
+    # ses) tek oturumunmuş gibi her koşuda birbirini siler
+    init = local_script_runner.LocalScriptRunner.__init__
+
+    def init_with_session_id(self, script_path, session_state, *args, **kwargs):
+        init(self, script_path, session_state, *args, **kwargs)
+        self._session_id = f"ogrenci-{id(session_state)}"
+    local_script_runner.LocalScriptRunner.__init__ = init_with_session_id
+
+    secrets = Secrets()
+    secrets._secrets = SECRETS
+    st.secrets = secrets
+
+    config.set_option("global.appTest", True)
+    app_test.patch_config_options = lambda options: contextlib.nullcontext()
+    return runtime
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(q * (len(values) - 1))))]
+
+
+class Student:
+    def __init__(self, idx, think, timeout, rng):
+        from streamlit.testing.v1 import AppTest
+        self.idx = idx
+        self.think = think
+        self.rng = rng
+        self.timings = {}
+        self.at = AppTest.from_file(APP, default_timeout=timeout)
+
+    def _step(self, name, fn):
+        start = time.perf_counter()
+        fn()
+        self.timings[name] = time.perf_counter() - start
+        if self.at.exception:
+            raise RuntimeError(f"{name}: {self.at.exception[0].value}")
+        if self.think:
+            time.sleep(self.rng.uniform(0, self.think))
+
+    def _click(self, label):
+        next(b for b in self.at.button if b.label == label).click().run()
+
+    def _answer(self, prefix, lesson):
+        for i in range(len(lesson)):
+            radio = self.at.radio(key=f"{prefix}_{i}")
+            radio.set_value(self.rng.choice(radio.options))
+
+    def run(self, lesson, media):
+        at = self.at
+        self._step("acilis", at.run)
+
+        def giris():
+            at.text_input[0].input(f"Öğrenci {self.idx}")
+            at.text_input[1].input(str(900000 + self.idx))
+            self._click("Sınava Başla")
+        self._step("giris", giris)
+
+        def on_test():
+            self._answer("p", lesson)
+            self._click("Testi Bitir")
+        self._step("on_test", on_test)
+
+        def pdf():
+            # İndirme tıklaması: sunucu ertelenmiş PDF verisini bu an üretir
+            button = next(b for b in at.get("download_button") if b.proto.label == "📑 Detaylı İndir")
+            media.execute_deferred(button.proto.deferred_file_id)
+        self._step("pdf", pdf)
+
+        def tts():
+            # Bir konunun özetini dinle (önbellek + TTS yolu)
+            i = self.rng.randrange(len(lesson))
+            at.button(key=f"d_{i}").click().run()
+        self._step("tts", tts)
+
+        self._step("son_teste_gec", lambda: self._click("Son Sınava Geç ➡️"))
+
+        def son_test():
+            self._answer("son", lesson)
+            self._click("Sınavı Bitir")
+        self._step("son_test", son_test)
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sınav akışı için eşzamanlı sınıf yük testi")
+    parser.add_argument("--students", type=int, default=40)
+    parser.add_argument("--ramp", type=float, default=0.0, help="öğrencilerin giriş yaptığı süre (sn)")
+    parser.add_argument("--think", type=float, default=0.0, help="adımlar arası en fazla düşünme süresi (sn)")
+    parser.add_argument("--topics", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--firestore-latency", type=float, default=0.05)
+    parser.add_argument("--tts-latency", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="sonucu bu dosyaya JSON olarak yaz")
+    args = parser.parse_args()
+
+    db = fakes.install(tts_latency=args.tts_latency, firestore_latency=args.firestore_latency)
+    media = share_runtime().media_file_mgr
+    from lessons import lesson_store
+    from results import RESULTS_COLLECTION
+    lesson = fakes.fake_topics(args.topics)
+    lesson_store.publish(lesson)
+
+    # Isınma: modüller, fontlar ve cache_resource'lar bir kez yüklensin
+    rss_base = rss_mb()
+    Student(-1, 0, args.timeout, random.Random(args.seed)).at.run()
+    rss_warm = rss_mb()
+    # Ertelenmiş PDF betik thread'i dışında üretilir; her tıklamada uyarı basılmasın
+    # (streamlit kayıt düzeyini config okunurken sıfırladığından ısınmadan sonra)
+    logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").setLevel(logging.ERROR)
+
+    errors = []
+    done = []
+    lock = threading.Lock()
+
+    def one(i):
+        time.sleep(args.ramp * i / max(1, args.students))
+        try:
+            s = Student(i, args.think, args.timeout, random.Random(args.seed + i)).run(lesson, media)
+            with lock:
+                done.append(s)
+        except Exception as e:
+            with lock:
+                errors.append(f"öğrenci {i}: {type(e).__name__}: {e}")
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.students) as pool:
+        list(pool.map(one, range(args.students)))
+    wall = time.perf_counter() - start
+    rss_peak = rss_mb()   # Tüm oturumlar hâlâ bellekte
+
+    # Gönderim kuyruğu arka planda yazar; hepsi Firestore'a ulaşana kadar bekle
+    drain_start = time.perf_counter()
+    while db.count(RESULTS_COLLECTION) < len(done) and time.perf_counter() - drain_start < args.timeout:
+        time.sleep(0.1)
+    drain = time.perf_counter() - drain_start
+
+    report = {
+        'students': args.students,
+        'completed': len(done),
+        'errors': errors[:20],
+        'wall_s': round(wall, 2),
+        'throughput_students_per_min': round(len(done) / wall * 60, 1) if wall else None,
+        'firestore_written': db.count(RESULTS_COLLECTION),
+        'firestore_drain_s': round(drain, 2),
+        'rss_mb': {
+            'base': round(rss_base, 1),
+            'after_warmup': round(rss_warm, 1),
+            'peak': round(rss_peak, 1),
+            'per_session': round((rss_peak - rss_warm) / max(1, len(done)), 2),
+        },
+        'steps': {},
+    }
+    for step in ["acilis"] + STEPS:
+        values = [s.timings[step] for s in done if step in s.timings]
+        if values:
+            report['steps'][step] = {
+                'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+                'max_ms': round(max(values) * 1000, 1),
+                'mean_ms': round(statistics.mean(values) * 1000, 1),
+            }
+
+    print(f"Öğrenci: {len(done)}/{args.students} tamamladı, {len(errors)} hata, {wall:.1f} sn")
+    print(f"Verim: {report['throughput_students_per_min']} öğrenci/dk")
+    print(f"Firestore: {report['firestore_written']} kayıt ({drain:.1f} sn bekleme)")
+    r = report['rss_mb']
+    print(f"RSS: başlangıç {r['base']} MB, ısınma sonrası {r['after_warmup']} MB, tepe {r['peak']} MB, oturum başına {r['per_session']} MB")
+    print(f"\n{'Adım':<15} {'p50':>9} {'p95':>9} {'p99':>9} {'maks':>9}")
+    for step, v in report['steps'].items():
+        print(f"{step:<15} {v['p50_ms']:>7.0f}ms {v['p95_ms']:>7.0f}ms {v['p99_ms']:>7.0f}ms {v['max_ms']:>7.0f}ms")
+    for e in errors[:5]:
+        print("HATA:", e)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    sys.exit(1 if errors else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+# --- DİSK ÖNBELLEĞİ ---
+# İçerik adresli (hash anahtarlı) dosya önbelleği.
+# Her anahtar bir klasördür: <kök>/<ilk 2 karakter>/<anahtar>/<dosya adı>
+# Boyut sınırı aşılınca en uzun süredir kullanılmayan kayıtlar silinir (LRU).
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+import time
+
+CACHE_DIR = os.environ.get("CACHE_DIR", ".cache")
+CACHE_MAX_MB = int(os.environ.get("CACHE_MAX_MB", "2048"))
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def copy_and_hash(stream, dest_path):
+    """Akışı diske parça parça kopyalar ve aynı geçişte sha256 özetini çıkarır."""
+    h = hashlib.sha256()
+    with open(dest_path, 'wb') as out:
+        for chunk in iter(lambda: stream.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+            out.write(chunk)
+    return h.hexdigest()
+
+
+def make_key(*parts):
+    """Anahtar parçalarını (video hash'i, model, ayarlar...) tek bir hash'e çevirir."""
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(repr(p).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+class DiskCache:
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_MB * 1024 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def _touch(self, path):
+        # LRU için son kullanım zamanını güncelle
+        try:
+            now = time.time()
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    # --- OKUMA ---
+    def get_path(self, key, name):
+        path = os.path.join(self._entry_dir(key), name)
+        if not os.path.exists(path):
+            return None
+        self._touch(path)
+        return path
+
+    def get_json(self, key, name):
+        path = self.get_path(key, name)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    # --- YAZMA ---
+    def put_file(self, key, name, src_path, move=False):
+        """Dosyayı önbelleğe atomik olarak koyar ve önbellekteki yolunu döndürür."""
+        entry = self._entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        dest = os.path.join(entry, name)
+        fd, tmp = tempfile.mkstemp(dir=entry, suffix=".tmp")
+        os.close(fd)
+        try:
+            if move:
+                shutil.move(src_path, tmp)
+            else:
+                shutil.copyfile(src_path, tmp)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._touch(dest)
+        self.evict()
+        return dest
+
+    def put_bytes(self, key, name, data):
+        entry = self._entry_dir(key)
+        os.makedirs(entry, exist_ok=True)
+        dest = os.path.join(entry, name)
+        fd, tmp = tempfile.mkstemp(dir=entry, suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, dest)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        self._touch(dest)
+        self.evict()
+        return dest
+
+    def put_json(self, key, name, obj):
+        data = json.dumps(obj, ensure_ascii=False, default=float).encode('utf-8')
+        return self.put_bytes(key, name, data)
+
+    # --- TEMİZLİK (LRU) ---
+    def _entries(self):
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            # Yalnızca 2 karakterlik parça klasörleri; alt önbellekler (ör. tts/) ayrı yönetilir
+            if len(shard) != 2 or not os.path.isdir(shard_dir):
+                continue
+            for key in os.listdir(shard_dir):
+                entry = os.path.join(shard_dir, key)
+                size = 0
+                last_used = 0
+                for name in os.listdir(entry):
+                    try:
+                        info = os.stat(os.path.join(entry, name))
+                    except OSError:
+                        continue
+                    size += info.st_size
+                    last_used = max(last_used, info.st_mtime)
+                yield entry, size, last_used
+
+    def evict(self):
+        with self._lock:
+            try:
+                entries = list(self._entries())
+            except OSError:
+                return
+            total = sum(size for _, size, _ in entries)
+            if total <= self.max_bytes:
+                return
+            # En eski kullanılan kayıttan başlayarak sil
+            for entry, size, _ in sorted(entries, key=lambda e: e[2]):
+                if total <= self.max_bytes:
+                    break
+                shutil.rmtree(entry, ignore_errors=True)
+                total -= size
@@ -0,0 +1,75 @@
+# --- SONUÇ GRAFİKLERİ ---
+# Küçük sınıflarda öğrenci başına çubuk grafik çizilir. Satır sayısı
+# CHART_MAX_ROWS'u aşınca tarayıcıya giden veri sınıf büyüklüğünden bağımsız
+# kalsın diye önceden sayılmış (binned) özet grafiklere geçilir.
+import os
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+CHART_MAX_ROWS = int(os.environ.get("CHART_MAX_ROWS", "60"))
+CHART_SAMPLE_ROWS = int(os.environ.get("CHART_SAMPLE_ROWS", "2000"))
+
+PRE_COL = '1. Test Doğru Sayısı'
+POST_COL = '2. Test Doğru Sayısı'
+COLORS = {
+    PRE_COL: '#EF553B',  # Kırmızı
+    POST_COL: '#00CC96'  # Yeşil
+}
+
+
+def student_bar_chart(df_clean, title="Ön Test vs Son Test Karşılaştırması"):
+    # Veriyi grafik için uygun formata (uzun format) çeviriyoruz
+    df_chart = df_clean[['Ad Soyad', PRE_COL, POST_COL]]
+    df_melted = df_chart.melt(id_vars='Ad Soyad', var_name='Test Türü', value_name='Puan')
+
+    fig = px.bar(
+        df_melted,
+        x='Ad Soyad',
+        y='Puan',
+        color='Test Türü',
+        barmode='group',            # Sütunları yan yana koy
+        text_auto=len(df_clean) <= CHART_MAX_ROWS // 2,  # Kalabalıkta yazılar okunmuyor
+        color_discrete_map=COLORS,
+        title=title
+    )
+    fig.update_layout(xaxis_title="Öğrenciler", yaxis_title="Doğru Sayısı")
+    return fig
+
+
+def net_histogram(df_clean):
+    # Histogram tarayıcıda değil burada sayılır; grafiğe sadece NET değeri başına bir çubuk gider
+    counts = df_clean['NET'].value_counts().sort_index()
+    fig = go.Figure(go.Bar(x=counts.index, y=counts.values, marker_color='#636EFA'))
+    fig.update_layout(title="NET Dağılımı", xaxis_title="NET (Son Test - Ön Test)", yaxis_title="Öğrenci Sayısı")
+    return fig
+
+
+def score_distribution(df_clean):
+    fig = go.Figure()
+    for col, name in ((PRE_COL, "Ön Test"), (POST_COL, "Son Test")):
+        counts = df_clean[col].value_counts().sort_index()
+        fig.add_trace(go.Bar(x=counts.index, y=counts.values, name=name, marker_color=COLORS[col]))
+    fig.update_layout(
+        title="Ön Test / Son Test Puan Dağılımı", barmode='group',
+        xaxis_title="Doğru Sayısı", yaxis_title="Öğrenci Sayısı"
+    )
+    return fig
+
+
+def sampled_student_chart(df_clean, sample_rows=CHART_SAMPLE_ROWS):
+    # Çok sayıda nokta için WebGL (Scattergl) kullanılır; örneklem sabit tutulur
+    sample = df_clean.sample(sample_rows, random_state=0) if len(df_clean) > sample_rows else df_clean
+    sample = sample.sort_values(POST_COL).reset_index(drop=True)
+    fig = go.Figure()
+    for col, name in ((PRE_COL, "Ön Test"), (POST_COL, "Son Test")):
+        fig.add_trace(go.Scattergl(
+            x=sample.index, y=sample[col], mode='markers', name=name,
+            marker=dict(color=COLORS[col], size=5, opacity=0.7),
+            text=sample['Ad Soyad'].astype(str), hovertemplate="%{text}: %{y}<extra></extra>",
+        ))
+    fig.update_layout(
+        title=f"Öğrenci Bazlı Puanlar ({len(sample)} / {len(df_clean)} öğrenci)",
+        xaxis_title="Öğrenciler (son teste göre sıralı)", yaxis_title="Doğru Sayısı"
+    )
+    return fig
@@ -0,0 +1,347 @@
+# --- DERS İŞLEME İŞLERİ ---
+# "Dersi İşle" ffmpeg, transkripsiyon ve Gemini adımlarını Streamlit script
+# thread'inde değil, arka plandaki iş havuzunda çalıştırır. Her aşamanın çıktısı
+# önbelleğe kontrol noktası olarak yazılır (ses, transkript, analiz); iş hata
+# verirse ya da süreç yeniden başlarsa son tamamlanan aşamadan devam eder.
+# İşin durumu JOBS_DIR/<iş_id>/job.json'da tutulur, yönetici sekmesi bunu okur.
+# Ders kırpılıp ya da bir kısmı yeniden çekilip tekrar yüklendiğinde önceki
+# işlerin parça transkriptleri ses parmak iziyle eşleştirilip tekrar kullanılır;
+# yalnızca yeni/değişen parçalar yazıya dökülür, analizde de yalnızca metni
+# değişen pencereler Gemini'ye gider (bkz. analysis.analyze_full_text_with_gemini).
+# İş klasörleri DiskCache'in LRU bütçesinin dışında olduğundan ayrıca budanır:
+# en yeni MAX_KEPT_JOBS iş tutulur, uzun süre başarısız kalan işin video kopyası silinir.
+import os
+import json
+import time
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from analysis import analyze_full_text_with_gemini
+from asr import ASR_ENGINE, ASR_MODEL, backend_cache_id
+from cache import CACHE_DIR, DiskCache, copy_and_hash, make_key
+from lessons import lesson_store
+from metrics import observe, timer
+from transcription import SAMPLE_RATE, SegmentIndex, extract_pcm, fingerprint, merge_parts, split_stable, transcribe_spans
+
+JOBS_DIR = os.path.join(CACHE_DIR, "jobs")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "1"))   # Transkripsiyon zaten tüm çekirdekleri kullanıyor
+MAX_LISTED_JOBS = 5
+REUSE_SOURCES = 5       # Parça transkripti aranacak en yeni önceki iş sayısı
+MAX_KEPT_JOBS = int(os.environ.get("MAX_KEPT_JOBS", "20"))
+FAILED_VIDEO_TTL_S = int(os.environ.get("FAILED_VIDEO_TTL_S", str(24 * 3600)))
+
+AUDIO_SETTINGS = ("pcm_s16le", SAMPLE_RATE, 1)
+
+STAGES = ("audio", "transcript", "analysis", "publish")
+STAGE_LABELS = {
+    "audio": "Ses çıkarma",
+    "transcript": "Transkripsiyon",
+    "analysis": "Gemini analizi",
+    "publish": "Yayınlama",
+}
+
+
+def _write_json_atomic(path, data):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+class LessonJob:
+    def __init__(self, job_id, video_hash, params, root=JOBS_DIR):
+        self.id = job_id
+        self.video_hash = video_hash
+        self.params = params
+        self.dir = os.path.join(root, job_id)
+        self.status = "queued"          # queued | running | done | failed
+        self.error = None
+        self.lesson_id = None
+        self.created = time.time()
+        self.stages = {s: {'status': 'pending', 'started': None, 'finished': None, 'progress': 0.0} for s in STAGES}
+
+    @property
+    def video_path(self):
+        return os.path.join(self.dir, "video.mp4")
+
+    @property
+    def running(self):
+        return self.status in ("queued", "running")
+
+    def to_dict(self):
+        return {
+            'id': self.id, 'video_hash': self.video_hash, 'params': self.params,
+            'status': self.status, 'error': self.error, 'lesson_id': self.lesson_id,
+            'created': self.created, 'stages': self.stages,
+        }
+
+    @classmethod
+    def from_dict(cls, d, root=JOBS_DIR):
+        job = cls(d['id'], d['video_hash'], d['params'], root)
+        job.status = d['status']
+        job.error = d.get('error')
+        job.lesson_id = d.get('lesson_id')
+        job.created = d.get('created', job.created)
+        job.stages.update(d.get('stages', {}))
+        return job
+
+    def save(self):
+        _write_json_atomic(os.path.join(self.dir, "job.json"), self.to_dict())
+
+
+class JobRunner:
+    """
+    İşleri sırayla çalıştırır. transcriber(engine, model_size) tek süreçli
+    transkripsiyon için hazır (bellekte tutulan) motoru döndürür;
+    on_publish(analysis) ders yayınlandıktan sonra çağrılır (ör. ses ön üretimi).
+    """
+
+    def __init__(self, cache=None, transcriber=None, on_publish=None, workers=JOB_WORKERS, root=JOBS_DIR):
+        self.cache = cache or DiskCache()
+        self.transcriber = transcriber
+        self.on_publish = on_publish
+        self.root = root
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="lesson-job")
+        self._jobs = {}
+        self._load()
+
+    def _load(self):
+        # Önceki süreçten yarıda kalan işler devam ettirilebilsin diye "failed" işaretlenir
+        try:
+            names = os.listdir(self.root)
+        except OSError:
+            return
+        for name in names:
+            if name.startswith("upload-"):
+                # Yarıda kalan yükleme kopyası
+                shutil.rmtree(os.path.join(self.root, name), ignore_errors=True)
+                continue
+            try:
+                with open(os.path.join(self.root, name, "job.json"), encoding='utf-8') as f:
+                    job = LessonJob.from_dict(json.load(f), self.root)
+            except (OSError, ValueError, KeyError):
+                continue
+            if job.running:
+                job.status = "failed"
+                job.error = "Sunucu yeniden başladı, iş yarıda kaldı."
+                for stage in job.stages.values():
+                    if stage['status'] == 'running':
+                        stage['status'] = 'failed'
+                job.save()
+            self._jobs[job.id] = job
+        self._prune()
+
+    def _prune(self):
+        """En yeni MAX_KEPT_JOBS dışındaki bitmiş işleri ve eskimiş başarısız işlerin videolarını siler."""
+        now = time.time()
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda j: j.created, reverse=True)
+            for job in jobs[MAX_KEPT_JOBS:]:
+                if not job.running:
+                    shutil.rmtree(job.dir, ignore_errors=True)
+                    del self._jobs[job.id]
+            for job in jobs[:MAX_KEPT_JOBS]:
+                # Devam ettirilmeyen işin videosu sonsuza dek tutulmaz; gerekirse ders yeniden yüklenir
+                try:
+                    if job.status == "failed" and now - os.path.getmtime(job.video_path) > FAILED_VIDEO_TTL_S:
+                        os.remove(job.video_path)
+                except OSError:
+                    pass
+
+    def submit(self, stream, engine=ASR_ENGINE, model_size=ASR_MODEL, paralel=True, map_reduce=None):
+        """
+        Yüklenen videoyu iş klasörüne kopyalar ve işi kuyruğa koyar. Aynı video/ayar
+        için iş tekrarlanmaz; iş bitmişse dersi tekrar güncel ders yapılır (dönen işin
+        durumu "done" kalır). Yayınlanan sürüm silinmişse iş yayın aşamasından yeniden çalışır.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        tmp_dir = os.path.join(self.root, f"upload-{threading.get_ident()}-{time.time_ns()}")
+        os.makedirs(tmp_dir)
+        try:
+            stream.seek(0)
+            video_hash = copy_and_hash(stream, os.path.join(tmp_dir, "video.mp4"))
+            params = {'engine': engine, 'model_size': model_size, 'paralel': paralel, 'map_reduce': map_reduce}
+            job_id = make_key(video_hash, sorted(params.items()))[:16]
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is not None and job.running:
+                    return job
+                if job is not None and job.status == "done":
+                    if job.lesson_id and lesson_store.set_current(job.lesson_id):
+                        return job
+                    job.lesson_id = None
+                    job.stages['publish']['status'] = 'pending'
+                if job is None:
+                    job = LessonJob(job_id, video_hash, params, self.root)
+                    os.makedirs(job.dir, exist_ok=True)
+                    self._jobs[job_id] = job
+                os.replace(os.path.join(tmp_dir, "video.mp4"), job.video_path)
+                self._start(job)
+            return job
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def resume(self, job_id):
+        """Başarısız işi son tamamlanan aşamadan devam ettirir."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.running:
+                return job
+            self._start(job)
+            return job
+
+    def _start(self, job):
+        job.status = "queued"
+        job.error = None
+        job.save()
+        self._pool.submit(self._run, job)
+
+    def jobs(self, limit=MAX_LISTED_JOBS):
+        """En yeni işler önce."""
+        return sorted(self._jobs.values(), key=lambda j: j.created, reverse=True)[:limit]
+
+    def _segment_index(self, job):
+        """Aynı motor/modelle işlenmiş en yeni önceki işlerin parça transkriptleri."""
+        index = SegmentIndex()
+        with self._lock:
+            others = [
+                j for j in sorted(self._jobs.values(), key=lambda j: j.created, reverse=True)
+                if j.id != job.id and j.params['engine'] == job.params['engine']
+                and j.params['model_size'] == job.params['model_size']
+            ][:REUSE_SOURCES]
+        for other in others:
+            index.add(self.cache.get_json(self._keys(other)[1], "segments.json") or [])
+        return index
+
+    # --- AŞAMALAR ---
+    def _keys(self, job):
+        audio_key = make_key(job.video_hash, AUDIO_SETTINGS)
+        transcript_key = make_key(job.video_hash, AUDIO_SETTINGS, backend_cache_id(job.params['engine'], job.params['model_size']))
+        analysis_key = make_key(transcript_key, "analysis", job.params['map_reduce'])
+        return audio_key, transcript_key, analysis_key
+
+    def _run(self, job):
+        job.status = "running"
+        job.save()
+        current = None
+        try:
+            for current in STAGES:
+                stage = job.stages[current]
+                if stage['status'] == 'done' and self._has_checkpoint(job, current):
+                    continue
+                stage.update(status='running', started=time.time(), finished=None, progress=0.0)
+                job.save()
+                getattr(self, f"_stage_{current}")(job, stage)
+                stage.update(status='done', finished=time.time(), progress=1.0)
+                job.save()
+            job.status = "done"
+            # Ses önbellekte; videoya artık gerek yok
+            if os.path.exists(job.video_path):
+                os.remove(job.video_path)
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+            if current:
+                job.stages[current]['status'] = 'failed'
+        job.save()
+        self._prune()
+
+    def _has_checkpoint(self, job, stage):
+        audio_key, transcript_key, analysis_key = self._keys(job)
+        if stage == "audio":
+            return self.cache.get_path(audio_key, "audio.npy") is not None
+        if stage == "transcript":
+            return self.cache.get_path(transcript_key, "transcript.json") is not None
+        if stage == "analysis":
+            return self.cache.get_path(analysis_key, "analysis.json") is not None
+        return job.lesson_id is not None
+
+    def _stage_audio(self, job, stage):
+        audio_key, _, _ = self._keys(job)
+        if self.cache.get_path(audio_key, "audio.npy") is not None:
+            return
+        if not os.path.exists(job.video_path):
+            raise RuntimeError("Video dosyası bulunamadı; dersi yeniden yükleyin.")
+        with timer("sesi_sokup_al") as m:
+            pcm = extract_pcm(job.video_path)
+            m.record('bytes', pcm.nbytes)
+        tmp_audio = os.path.join(job.dir, "audio.npy")
+        np.save(tmp_audio, pcm)
+        self.cache.put_file(audio_key, "audio.npy", tmp_audio, move=True)
+
+    def _stage_transcript(self, job, stage):
+        audio_key, transcript_key, _ = self._keys(job)
+        if self.cache.get_path(transcript_key, "transcript.json") is not None:
+            return
+        audio_path = self.cache.get_path(audio_key, "audio.npy")
+        if audio_path is None:
+            # Ses önbellekten silinmiş; önce ses aşaması tekrar çalışsın
+            job.stages['audio']['status'] = 'pending'
+            raise RuntimeError("Ses önbellekte bulunamadı, iş ses aşamasından devam edecek.")
+        # Önbellekteki ses belleğe kopyalanmadan eşlenir
+        pcm = np.load(audio_path, mmap_mode='r')
+        engine, model_size = job.params['engine'], job.params['model_size']
+
+        # Ses duraklamalardan bölünür; önceki yüklemelerde aynı sesi taşıyan parçalar yeniden yazıya dökülmez
+        bounds = split_stable(pcm)
+        fps = [fingerprint(pcm[s:e]) for s, e in bounds]
+        index = self._segment_index(job)
+        parts = [index.find(fp) for fp in fps]
+        todo = [i for i, part in enumerate(parts) if part is None]
+        reused = len(bounds) - len(todo)
+        stage['reused'] = [reused, len(bounds)]
+
+        def progress(done, total):
+            stage['progress'] = (reused + done) / len(bounds)
+
+        with timer("transcribe") as m:
+            # Paralel modda parçalar çekirdeklere dağıtılır, değilse bellekteki motorla sırayla işlenir
+            backend = None if job.params['paralel'] or self.transcriber is None else self.transcriber(engine, model_size)
+            new = transcribe_spans(pcm, [bounds[i] for i in todo], engine, model_size, progress=progress, backend=backend)
+            for i, part in zip(todo, new):
+                parts[i] = part
+            res = merge_parts(parts, [s / SAMPLE_RATE for s, _ in bounds])
+            m.record('bytes', sum(bounds[i][1] - bounds[i][0] for i in todo) * pcm.itemsize)
+            m.record('chars', len(res['text']))
+        observe("transcribe_parca_yeniden", 'rows', reused)
+        manifest = [
+            {'start': s / SAMPLE_RATE, 'end': e / SAMPLE_RATE, 'fp': fp,
+             'text': part['text'], 'segments': part['segments'], 'language': part['language']}
+            for (s, e), fp, part in zip(bounds, fps, parts)
+        ]
+        self.cache.put_json(transcript_key, "segments.json", manifest)
+        self.cache.put_json(transcript_key, "transcript.json", res)
+
+    def _stage_analysis(self, job, stage):
+        _, transcript_key, analysis_key = self._keys(job)
+        if self.cache.get_path(analysis_key, "analysis.json") is not None:
+            return
+        transcript = self.cache.get_json(transcript_key, "transcript.json")
+        if transcript is None:
+            job.stages['transcript']['status'] = 'pending'
+            raise RuntimeError("Transkript önbellekte bulunamadı, iş transkripsiyondan devam edecek.")
+        # Parça metinleri varsa analiz pencereleri onlardan kurulur; metni değişmeyen pencereler önbellekten gelir
+        manifest = self.cache.get_json(transcript_key, "segments.json")
+        segments = [part['text'] for part in manifest] if manifest else None
+        # Eksik pencere / yedek model uyarıları işe yazılır, yönetici panelinde gösterilir
+        stage['warnings'] = []
+        analysis = analyze_full_text_with_gemini(transcript['text'], map_reduce=job.params['map_reduce'],
+                                                 segments=segments, cache=self.cache, warnings=stage['warnings'])
+        if not analysis:
+            raise RuntimeError("AI Yanıt Vermedi.")
+        self.cache.put_json(analysis_key, "analysis.json", analysis)
+
+    def _stage_publish(self, job, stage):
+        _, _, analysis_key = self._keys(job)
+        analysis = self.cache.get_json(analysis_key, "analysis.json")
+        if analysis is None:
+            job.stages['analysis']['status'] = 'pending'
+            raise RuntimeError("Analiz önbellekte bulunamadı, iş analizden devam edecek.")
+        # Yeni sürüm olarak yayınlanır; süren sınavlar eski sürümle devam eder
+        job.lesson_id = lesson_store.publish(analysis)
+        if self.on_publish is not None:
+            self.on_publish(analysis)
@@ -0,0 +1,132 @@
+# --- DERS DEPOSU ---
+# Her ders sürümü kendi dosyasında (LESSON_DIR/<ders_id>.json) durur; ders
+# kimliği içeriğin hash'idir, yani yayınlanan bir ders dosyası hiç değişmez.
+# Süreç her sürümü bir kez okuyup değiştirilemez (frozen) bir nesne olarak
+# tüm oturumlarla paylaşır; oturumlar sadece ders kimliğini tutar. Yeni ders
+# yayınlamak sadece "güncel ders" işaretçisini değiştirir, sınavı süren
+# öğrenciler başladıkları sürümle devam eder.
+import os
+import json
+import threading
+from collections import namedtuple
+
+from cache import make_key
+
+LESSON_DIR = os.environ.get("LESSON_DIR", "lessons")
+CURRENT_FILE = "current.txt"
+LEGACY_FILE = "lesson_data.json"   # Tek dosyalı eski düzen; ilk açılışta depoya aktarılır
+
+Lesson = namedtuple("Lesson", ["id", "topics", "mtime"])
+
+
+class FrozenDict(dict):
+    """Salt okunur sözlük. dict alt sınıfı olduğu için json/fpdf/pickle ile çalışır."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Ders verisi salt okunurdur.")
+
+    __setitem__ = __delitem__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        # Süreç havuzuna (PDF) giderken __setitem__ çağrılmadan yeniden kurulur
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(obj):
+    if isinstance(obj, dict):
+        return FrozenDict((k, freeze(v)) for k, v in obj.items())
+    if isinstance(obj, list):
+        return tuple(freeze(v) for v in obj)
+    return obj
+
+
+def lesson_id(topics):
+    """Ders kimliği = içeriğin hash'i (sınav kayıtlarındaki 'ders_surumu')."""
+    return make_key(json.dumps(topics, ensure_ascii=False, sort_keys=True))
+
+
+def _write_atomic(path, text):
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+class LessonStore:
+    def __init__(self, root=LESSON_DIR, legacy_file=LEGACY_FILE):
+        self.root = root
+        self.legacy_file = legacy_file
+        self._lock = threading.Lock()
+        self._lessons = {}          # ders_id -> Lesson
+        self._current = (None, None)  # (işaretçi mtime, ders_id)
+
+    def _path(self, lesson_id):
+        return os.path.join(self.root, f"{lesson_id}.json")
+
+    def get(self, lesson_id):
+        """Dersi paylaşılan önbellekten döner; dosya değiştiyse yeniden okur. Yoksa None."""
+        if not lesson_id:
+            return None
+        path = self._path(lesson_id)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        lesson = self._lessons.get(lesson_id)
+        if lesson is not None and lesson.mtime == mtime:
+            return lesson
+        with self._lock:
+            lesson = self._lessons.get(lesson_id)
+            if lesson is None or lesson.mtime != mtime:
+                with open(path, 'r', encoding='utf-8') as f:
+                    lesson = Lesson(lesson_id, freeze(json.load(f)), mtime)
+                self._lessons[lesson_id] = lesson
+        return lesson
+
+    def current_id(self):
+        """Yeni başlayan sınavların kullanacağı ders kimliği. Ders yoksa None."""
+        path = os.path.join(self.root, CURRENT_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return self._import_legacy()
+        cached_mtime, cached_id = self._current
+        if cached_mtime == mtime:
+            return cached_id
+        with open(path, 'r', encoding='utf-8') as f:
+            current = f.read().strip() or None
+        self._current = (mtime, current)
+        return current
+
+    def publish(self, topics):
+        """Dersi yeni bir sürüm olarak kaydeder ve güncel ders yapar. Ders kimliğini döner."""
+        new_id = lesson_id(topics)
+        os.makedirs(self.root, exist_ok=True)
+        path = self._path(new_id)
+        with self._lock:
+            if not os.path.exists(path):
+                _write_atomic(path, json.dumps(topics, ensure_ascii=False))
+            _write_atomic(os.path.join(self.root, CURRENT_FILE), new_id)
+        return new_id
+
+    def set_current(self, lesson_id):
+        """Daha önce yayınlanmış bir sürümü tekrar güncel ders yapar. Sürüm yoksa False."""
+        with self._lock:
+            if not os.path.exists(self._path(lesson_id)):
+                return False
+            _write_atomic(os.path.join(self.root, CURRENT_FILE), lesson_id)
+        return True
+
+    def _import_legacy(self):
+        if not self.legacy_file or not os.path.exists(self.legacy_file):
+            return None
+        try:
+            with open(self.legacy_file, 'r', encoding='utf-8') as f:
+                topics = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return self.publish(topics) if topics else None
+
+
+lesson_store = LessonStore()
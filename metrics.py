@@ -0,0 +1,275 @@
+# --- AŞAMA ÖLÇÜMLERİ ---
+# Yavaş bir dersin ffmpeg'den mi, transkripsiyondan mı, Gemini'den mi, TTS,
+# PDF ya da Firestore'dan mı kaynaklandığı görülebilsin diye her aşamanın
+# süresi, işlediği bayt/karakter/token sayısı, tekrar denemeleri ve hataları
+# süreç genelinde histogramlarda toplanır.
+# Dışa aktarım (ikisi de isteğe bağlı):
+#   METRICS_PORT : Prometheus metin formatında /metrics sunan HTTP ucu
+#   METRICS_LOG  : her ölçümü JSON satırı olarak yazan dönen (rotating) log dosyası
+# Tek bir çağrı için cProfile çıktısı arm_profile(aşama) ile alınabilir.
+import io
+import os
+import json
+import time
+import pstats
+import bisect
+import logging
+import cProfile
+import functools
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cache import CACHE_DIR
+
+METRICS_PORT = int(os.environ.get("METRICS_PORT", "0"))
+METRICS_LOG = os.environ.get("METRICS_LOG", "")
+METRICS_LOG_MAX_MB = int(os.environ.get("METRICS_LOG_MAX_MB", "10"))
+PROFILE_DIR = os.path.join(CACHE_DIR, "profiles")
+PREFIX = "makale"
+
+# Ölçüm türü -> histogram kova sınırları
+BUCKETS = {
+    'seconds': (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800),
+    'bytes': tuple(1024 * 4 ** i for i in range(11)),          # 1 KB .. 1 GB
+    'chars': (100, 300, 1000, 3000, 10000, 30000, 100000, 300000, 1000000),
+    'tokens': (100, 300, 1000, 3000, 10000, 30000, 100000, 300000, 1000000),
+    'retries': (0, 1, 2, 3, 5, 10),
+    'rows': (1, 10, 100, 1000, 10000, 100000, 1000000),
+}
+
+
+class Histogram:
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)   # Son kova: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """Kova sınırlarından yaklaşık yüzdelik (Prometheus histogram_quantile gibi)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.bounds[-1]
+        return self.bounds[-1]
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._hists = {}        # (aşama, tür) -> Histogram
+        self._errors = {}       # aşama -> sayı
+        self._profile_armed = set()
+        self.profiles = deque(maxlen=10)   # (aşama, dosya, özet metni)
+        self._log = None
+        if METRICS_LOG:
+            self._log = logging.getLogger("makale.metrics")
+            self._log.propagate = False
+            if not self._log.handlers:
+                self._log.addHandler(RotatingFileHandler(METRICS_LOG, maxBytes=METRICS_LOG_MAX_MB * 1024 * 1024, backupCount=5))
+            self._log.setLevel(logging.INFO)
+
+    def observe(self, stage, kind, value):
+        with self._lock:
+            hist = self._hists.get((stage, kind))
+            if hist is None:
+                hist = self._hists[(stage, kind)] = Histogram(BUCKETS[kind])
+            hist.observe(value)
+
+    def error(self, stage):
+        with self._lock:
+            self._errors[stage] = self._errors.get(stage, 0) + 1
+
+    def log_event(self, event):
+        if self._log is not None:
+            self._log.info(json.dumps(event, ensure_ascii=False, default=str))
+
+    # --- PROFİL ---
+    def arm_profile(self, stage):
+        """Aşamanın bir sonraki çağrısı cProfile altında çalışır."""
+        with self._lock:
+            self._profile_armed.add(stage)
+
+    def _take_profile(self, stage):
+        with self._lock:
+            if stage in self._profile_armed:
+                self._profile_armed.discard(stage)
+                return True
+            return False
+
+    def _save_profile(self, stage, profiler):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{stage}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(25)
+        self.profiles.append((stage, path, out.getvalue()))
+
+    # --- DIŞA AKTARIM ---
+    def summary(self):
+        """Aşama başına özet tablo satırları (yönetici paneli için)."""
+        with self._lock:
+            stages = sorted({s for s, _ in self._hists} | set(self._errors))
+            rows = []
+            for stage in stages:
+                sec = self._hists.get((stage, 'seconds'))
+                row = {
+                    'Aşama': stage,
+                    'Çağrı': sec.count if sec else 0,
+                    'Hata': self._errors.get(stage, 0),
+                    'Ort. Süre (sn)': round(sec.sum / sec.count, 3) if sec and sec.count else None,
+                    'p50 (sn)': sec.quantile(0.5) if sec else None,
+                    'p95 (sn)': sec.quantile(0.95) if sec else None,
+                }
+                for kind in ('bytes', 'chars', 'tokens', 'retries', 'rows'):
+                    h = self._hists.get((stage, kind))
+                    if h and h.count:
+                        row[f'Ort. {kind}'] = round(h.sum / h.count, 1)
+                rows.append(row)
+            return rows
+
+    def render_prometheus(self):
+        lines = []
+        with self._lock:
+            for kind in BUCKETS:
+                name = f"{PREFIX}_stage_{kind}"
+                items = [(s, h) for (s, k), h in sorted(self._hists.items()) if k == kind]
+                if not items:
+                    continue
+                lines.append(f"# TYPE {name} histogram")
+                for stage, h in items:
+                    cum = 0
+                    for bound, c in zip(h.bounds, h.counts):
+                        cum += c
+                        lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {cum}')
+                    lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                    lines.append(f'{name}_sum{{stage="{stage}"}} {h.sum}')
+                    lines.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+            lines.append(f"# TYPE {PREFIX}_stage_errors_total counter")
+            for stage, n in sorted(self._errors.items()):
+                lines.append(f'{PREFIX}_stage_errors_total{{stage="{stage}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+# --- ÖLÇÜM API'Sİ ---
+class timer:
+    """
+    with timer("aşama") as m: ...; m.record('bytes', n)
+    Süre her durumda kaydedilir; istisna ya da m.fail() hata sayılır.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.values = {}
+        self.failed = False
+        self._profiler = None
+
+    def record(self, kind, value):
+        if value is not None:
+            self.values[kind] = value
+
+    def fail(self):
+        self.failed = True
+
+    def __enter__(self):
+        if registry._take_profile(self.stage):
+            self._profiler = cProfile.Profile()
+            try:
+                self._profiler.enable()
+            except ValueError:
+                # Bu thread'de başka bir profilci açık
+                self._profiler = None
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        if self._profiler is not None:
+            self._profiler.disable()
+            registry._save_profile(self.stage, self._profiler)
+        failed = self.failed or exc_type is not None
+        registry.observe(self.stage, 'seconds', elapsed)
+        for kind, value in self.values.items():
+            registry.observe(self.stage, kind, value)
+        if failed:
+            registry.error(self.stage)
+        registry.log_event({'ts': time.time(), 'stage': self.stage, 'seconds': round(elapsed, 4),
+                            'ok': not failed, **self.values})
+        return False
+
+
+def instrument(stage, ok=None, measure=None):
+    """
+    Fonksiyonu aşama ölçümüyle sarar.
+    ok(sonuç) False dönerse (hatayı kendisi yakalayıp None döndüren fonksiyonlar için) hata sayılır.
+    measure(sonuç, args, kwargs) -> {'bytes': .., 'chars': ..} ek ölçümleri verir.
+    """
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timer(stage) as m:
+                result = fn(*args, **kwargs)
+                if ok is not None and not ok(result):
+                    m.fail()
+                if measure is not None:
+                    for kind, value in measure(result, args, kwargs).items():
+                        m.record(kind, value)
+                return result
+        return wrapper
+    return deco
+
+
+def observe(stage, kind, value):
+    registry.observe(stage, kind, value)
+
+
+# --- PROMETHEUS UCU ---
+_server = None
+_server_lock = threading.Lock()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.rstrip('/') not in ('', '/metrics'):
+            self.send_error(404)
+            return
+        body = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_exporter(port=METRICS_PORT):
+    """METRICS_PORT tanımlıysa /metrics ucunu bir kez başlatır (her rerun'da çağrılabilir)."""
+    global _server
+    if not port or _server is not None:
+        return _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer(("0.0.0.0", port), _MetricsHandler)
+            except OSError as e:
+                logging.getLogger(__name__).warning("Metrik ucu açılamadı (port %s): %s", port, e)
+                _server = False
+                return None
+            threading.Thread(target=_server.serve_forever, name="metrics-http", daemon=True).start()
+    return _server
@@ -0,0 +1,153 @@
+# --- PDF RAPORLARI ---
+# Çalışma planı PDF'leri burada dizilir. Toplu dışa aktarımda process havuzundaki
+# işçiler bu modülü import ettiği için Streamlit'e bağımlı değildir.
+import os
+import zipfile
+import tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from fpdf import FPDF
+
+FONT_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_WORKERS = max(1, min(8, (os.cpu_count() or 1)))
+
+
+# --- PDF SINIFI (TÜRKÇE DESTEKLİ) ---
+class PDF(FPDF):
+    def header(self):
+        # Header otomatik çalıştığı için fontu burada tekrar set etmemiz gerekebilir
+        # Ancak add_font aşağıda yapıldığı için burada direkt kullanabiliriz.
+        # Eğer hata alırsanız header içindeki fontu 'Arial' bırakıp gövdeyi değiştirebiliriz
+        # ama genelde çalışır.
+        self.set_font('Roboto', 'B', 15)
+        self.cell(0, 10, 'Kişiselleştirilmiş Çalışma Planı', 0, 1, 'C') # Artık Türkçe yazabiliriz
+        self.ln(5)
+
+    def topic_section(self, title, summary, extra_info, is_mistake, include_extra):
+        if is_mistake:
+            self.set_text_color(200, 0, 0)
+            title = f"(!) {title} - [TEKRAR ET]"
+        else:
+            self.set_text_color(0, 100, 0)
+            title = f"{title} (Tamamlandı)" # 'ı' harfi artık sorun değil
+            
+        # Başlık Fontu
+        self.set_font('Roboto', 'B', 12)
+        self.cell(0, 10, title, ln=1)
+        
+        # İçerik Fontu
+        self.set_text_color(0)
+        self.set_font('Roboto', '', 11)
+        # safe_text kullanmıyoruz, direkt summary veriyoruz
+        self.multi_cell(0, 6, summary)
+        self.ln(2)
+        
+        if include_extra and extra_info:
+            self.set_text_color(80, 80, 80)
+            self.set_font('Roboto', '', 10) # İtalik dosyanız yoksa Normal ('') kullanın
+            self.multi_cell(0, 6, f"[EK KAYNAK]: {extra_info}")
+            self.ln(2)
+            
+        self.set_draw_color(200, 200, 200)
+        self.line(10, self.get_y(), 200, self.get_y())
+        self.ln(5)
+
+
+# --- FONTLAR (SÜREÇ BAŞINA BİR KEZ) ---
+_fonts = None
+
+
+def load_pdf_fonts():
+    # TTF dosyaları süreç başına bir kez ayrıştırılır, her PDF'te tekrar okunmaz.
+    # uni=True parametresi Türkçe karakterlerin (UTF-8) düzgün işlenmesini sağlar.
+    global _fonts
+    if _fonts is None:
+        proto = FPDF()
+        proto.add_font('Roboto', '', os.path.join(FONT_DIR, 'Roboto-Regular.ttf'), uni=True)
+        proto.add_font('Roboto', 'B', os.path.join(FONT_DIR, 'Roboto-Bold.ttf'), uni=True)
+        _fonts = (proto.fonts, proto.font_files)
+    return _fonts
+
+
+def use_cached_fonts(pdf):
+    fonts, font_files = load_pdf_fonts()
+    for key, font in fonts.items():
+        font = dict(font)
+        font['i'] = len(pdf.fonts) + 1
+        font['subset'] = list(font['subset']) # Her PDF kendi karakter alt kümesini doldurur
+        pdf.fonts[key] = font
+    for key, info in font_files.items():
+        pdf.font_files[key] = dict(info)
+
+
+def render_study_pdf(data, mistakes, include_extra=True):
+    """PDF baytlarını döndürür. Font yüklenemezse hata fırlatır."""
+    pdf = PDF()
+    use_cached_fonts(pdf)
+
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    
+    # Başlık kısmı
+    pdf.set_font("Roboto", '', 10)
+    pdf.set_text_color(100, 100, 100)
+    type_str = "Detaylı Rapor (Ek Kaynaklı)" if include_extra else "Özet Rapor"
+    pdf.cell(0, 10, f"Rapor Türü: {type_str}", ln=1, align='C')
+    pdf.ln(5)
+    
+    for i, item in enumerate(data):
+        baslik = item.get('alt_baslik', 'Konu')
+        ozet = item.get('ozet', '')
+        ek_bilgi = item.get('ek_bilgi', '')
+        is_mistake = i in mistakes
+        
+        # safe_text fonksiyonunu ARTIK KULLANMIYORUZ
+        pdf.topic_section(baslik, ozet, ek_bilgi, is_mistake, include_extra)
+        
+    # Çıktı alma
+    return pdf.output(dest='S').encode('latin-1', 'replace') 
+    # Not: FPDF'in bazı versiyonlarında .encode() gereklidir, 
+    # font yüklenince içerik binary'e dönüşür, bu kod genelde çalışır.
+
+
+# --- TOPLU DIŞA AKTARIM (TÜM SINIF) ---
+def _pdf_name(student):
+    name = str(student.get('ad_soyad', 'Bilinmiyor')).strip().replace(' ', '_')
+    name = "".join(ch for ch in name if ch.isalnum() or ch in '_-')
+    return f"{student.get('no', '0')}_{name}.pdf"
+
+
+def build_class_zip(data, students, include_extra=True, workers=PDF_WORKERS):
+    """
+    Her öğrencinin kişisel planını process havuzunda dizer ve ZIP'e yazar.
+    PDF içeriği sadece yanlış konu kümesine bağlı olduğu için aynı kümeye sahip
+    öğrencilerin PDF'i bir kez dizilir ve hepsi için tekrar kullanılır.
+    ZIP, dizim sırasında PDF'ler birikmesin diye diske taşan geçici dosyaya
+    parça parça yazılır; st.download_button bu dosya türünü kabul etmediği için
+    sonunda bayt olarak okunur. Geriye (ZIP baytları, öğrenci sayısı, dizilen PDF sayısı) döner.
+    """
+    groups = {}
+    for student in students:
+        key = tuple(sorted(set(student.get('yanlislar', []))))
+        groups.setdefault(key, []).append(student)
+
+    out = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+    with zipfile.ZipFile(out, 'w', zipfile.ZIP_DEFLATED) as zf:
+        if len(groups) <= 1 or workers <= 1:
+            rendered = ((key, render_study_pdf(data, set(key), include_extra)) for key in groups)
+            for key, pdf in rendered:
+                for student in groups[key]:
+                    zf.writestr(_pdf_name(student), pdf)
+        else:
+            ctx = mp.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=min(workers, len(groups)), mp_context=ctx) as pool:
+                futures = {pool.submit(render_study_pdf, data, set(key), include_extra): key for key in groups}
+                # Biten PDF hemen ZIP'e yazılır, hepsinin bitmesi beklenmez
+                for fut in as_completed(futures):
+                    pdf = fut.result()
+                    for student in groups[futures[fut]]:
+                        zf.writestr(_pdf_name(student), pdf)
+    with out:
+        out.seek(0)
+        return out.read(), len(students), len(groups)
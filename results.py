@@ -0,0 +1,448 @@
+# --- SINAV SONUÇLARI ---
+# Firestore'daki 'exam_results' kayıtları ve ders bazlı özet (aggregate) belgeleri.
+# Özet belgesi her kayıtla aynı transaction içinde güncellenir; panel metrikleri
+# öğrenci sayısından bağımsız olarak tek belge okumasıyla gelir.
+import io
+import os
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from cache import CACHE_DIR
+
+RESULTS_COLLECTION = 'exam_results'
+AGGREGATE_COLLECTION = 'class_aggregates'
+DEFAULT_LESSON = 'genel'   # Ders sürümü olmayan eski kayıtlar
+
+# Yerel önbelleğe çekilen alanlar (tablo ve toplu PDF için gerekenler)
+RESULT_FIELDS = [
+    'ad_soyad', 'no', 'on_test', 'on_test_puan', 'son_test', 'son_test_puan',
+    'toplam_soru', 'yanlislar', 'ders_surumu', 'guncelleme',
+]
+SYNC_PAGE_SIZE = 500
+RESULTS_DB = os.path.join(CACHE_DIR, "results.sqlite")
+SCHEMA_VERSION = "2"
+EXPORT_CHUNK_ROWS = 5000
+
+# --- ŞEMA ---
+# Kanonik alan: (tablo/CSV sütunu, tip, varsayılan). None varsayılan = dersin soru sayısı
+RESULT_SCHEMA = {
+    'ad_soyad':    ('Ad Soyad', 'category', 'Bilinmiyor'),
+    'no':          ('Öğrenci No', 'string', '0'),
+    'toplam_soru': ('Soru Sayısı', 'int16', None),
+    'on_test':     ('1. Test Doğru Sayısı', 'int16', 0),
+    'son_test':    ('2. Test Doğru Sayısı', 'int16', 0),
+}
+# Eski alan -> kanonik alan. Eski alan doluysa öncelikli (önceki combine_first davranışı)
+LEGACY_FIELDS = {'on_test_puan': 'on_test', 'son_test_puan': 'son_test'}
+TABLE_COLUMNS = ['Ad Soyad', 'Öğrenci No', 'Soru Sayısı', '1. Test Doğru Sayısı', '2. Test Doğru Sayısı', 'NET']
+
+
+def migrate_record(record):
+    """Eski alan adlarını kanonik alanlara taşır ve sayıları int'e çevirir (kayıt başına bir kez)."""
+    record = dict(record)
+    for old, new in LEGACY_FIELDS.items():
+        val = record.pop(old, None)
+        if val is not None:
+            record[new] = val
+    for field, (_, dtype, _) in RESULT_SCHEMA.items():
+        if dtype == 'int16' and record.get(field) is not None:
+            try:
+                record[field] = int(record[field])
+            except (TypeError, ValueError):
+                record[field] = None
+    return record
+
+
+def format_data_for_csv(df, soru_sayisi_input=None):
+    """Kayıt tablosunu şemadaki tiplerle (int16 puanlar, kategorik isimler) tabloya çevirir."""
+    # Eğer veride 'toplam_soru' varsa onu kullan. Yoksa varsayılan (o anki dersin sorusu) değerini kullan.
+    varsayilan = soru_sayisi_input if (soru_sayisi_input and soru_sayisi_input > 0) else 15
+
+    # Önbellekten gelen veri zaten kanonik; ham Firestore verisinde eski alanlar tek adımda birleşir
+    for old, new in LEGACY_FIELDS.items():
+        if old in df.columns:
+            df[new] = df[old].combine_first(df[new]) if new in df.columns else df[old]
+
+    out = {}
+    for field, (column, dtype, default) in RESULT_SCHEMA.items():
+        if default is None:
+            default = varsayilan
+        if field not in df.columns:
+            out[column] = pd.Series(default, index=df.index, dtype=dtype)
+        elif dtype == 'int16':
+            out[column] = pd.to_numeric(df[field], errors='coerce').fillna(default).astype(dtype)
+        else:
+            out[column] = df[field].fillna(default).astype(str).astype(dtype)
+    table = pd.DataFrame(out, index=df.index)
+    table['NET'] = (table['2. Test Doğru Sayısı'] - table['1. Test Doğru Sayısı']).astype('int16')
+    return table[TABLE_COLUMNS].reset_index(drop=True)
+
+
+def record_scores(record):
+    """Kayıttan (ön test, son test) puanlarını okur; eski alan adlarını da tanır."""
+    def _int(*keys):
+        for key in keys:
+            val = record.get(key)
+            if val is None:
+                continue
+            try:
+                return int(val)
+            except (TypeError, ValueError):
+                continue
+        return 0
+    return _int('on_test_puan', 'on_test'), _int('son_test_puan', 'son_test')
+
+
+def lesson_of(record):
+    return record.get('ders_surumu') or DEFAULT_LESSON
+
+
+def empty_aggregate(lesson):
+    return {
+        'ders_surumu': lesson,
+        'ogrenci_sayisi': 0,
+        'on_test_toplam': 0,
+        'son_test_toplam': 0,
+        'net_toplam': 0,
+        'son_test_max': 0,
+        'net_hist': {},
+        'son_test_hist': {},
+    }
+
+
+def apply_record(agg, record, sign=1):
+    """Kaydın katkısını özete ekler (sign=1) ya da çıkarır (sign=-1)."""
+    pre, post = record_scores(record)
+    net = post - pre
+    agg['ogrenci_sayisi'] += sign
+    agg['on_test_toplam'] += sign * pre
+    agg['son_test_toplam'] += sign * post
+    agg['net_toplam'] += sign * net
+    for field, value in (('net_hist', net), ('son_test_hist', post)):
+        hist = agg[field]
+        key = str(value)
+        hist[key] = hist.get(key, 0) + sign
+        if hist[key] <= 0:
+            del hist[key]
+    # Maksimum azaltılamadığı için histogramdan türetilir
+    agg['son_test_max'] = max((int(k) for k in agg['son_test_hist']), default=0)
+    return agg
+
+
+def aggregate_metrics(agg):
+    """Panel kartları için (öğrenci sayısı, ortalama NET, en yüksek son test)."""
+    n = agg.get('ogrenci_sayisi', 0)
+    avg_net = agg.get('net_toplam', 0) / n if n else 0.0
+    return n, avg_net, agg.get('son_test_max', 0)
+
+
+# --- FIRESTORE ---
+def _agg_ref(db, lesson):
+    return db.collection(AGGREGATE_COLLECTION).document(str(lesson))
+
+
+def save_batch_with_aggregate(db, records):
+    """
+    Birden fazla öğrenci kaydını ve etkilenen ders özetlerini tek transaction'da yazar.
+    Aynı öğrenci no'su listede birden fazla varsa sonuncusu geçerlidir.
+    """
+    from firebase_admin import firestore  # Öğrenci oturumu açılırken yüklenmesin
+    latest = {str(r['no']): r for r in records}
+    refs = {no: db.collection(RESULTS_COLLECTION).document(no) for no in latest}
+
+    @firestore.transactional
+    def _kaydet(transaction):
+        # Transaction'da önce tüm okumalar, sonra yazmalar yapılmalı
+        olds = {}
+        for snap in db.get_all(list(refs.values()), transaction=transaction):
+            if snap.exists:
+                olds[snap.id] = snap.to_dict()
+        lessons = {lesson_of(r) for r in latest.values()} | {lesson_of(o) for o in olds.values()}
+        aggs = {}
+        for l in lessons:
+            snap = _agg_ref(db, l).get(transaction=transaction)
+            aggs[l] = snap.to_dict() if snap.exists else empty_aggregate(l)
+
+        for no, record in latest.items():
+            # Aynı öğrenci tekrar gönderirse eski katkısı düşülür
+            old = olds.get(no)
+            if old is not None:
+                apply_record(aggs[lesson_of(old)], old, sign=-1)
+            apply_record(aggs[lesson_of(record)], record)
+            # Yerel önbellek bu alana göre sadece yeni kayıtları çeker
+            transaction.set(refs[no], {**record, 'guncelleme': firestore.SERVER_TIMESTAMP})
+        for l, agg in aggs.items():
+            transaction.set(_agg_ref(db, l), agg)
+
+    _kaydet(db.transaction())
+
+
+def load_aggregate(db, lesson):
+    snap = _agg_ref(db, lesson).get()
+    return snap.to_dict() if snap.exists else None
+
+
+def rebuild_aggregates(db):
+    """Tüm kayıtları bir kez tarayıp özet belgelerini baştan yazar (eski kayıtlar için)."""
+    aggs = {}
+    for doc in db.collection(RESULTS_COLLECTION).stream():
+        record = doc.to_dict()
+        lesson = lesson_of(record)
+        apply_record(aggs.setdefault(lesson, empty_aggregate(lesson)), record)
+    batch = db.batch()
+    for lesson, agg in aggs.items():
+        batch.set(_agg_ref(db, lesson), agg)
+    batch.commit()
+    return aggs
+
+
+# --- YEREL SONUÇ ÖNBELLEĞİ (SQLITE) ---
+class ResultsStore:
+    """
+    exam_results kayıtlarının yerel kopyası. Her yenilemede sadece son senkrondan
+    sonra değişen belgeler, sadece gereken alanlarla ve sayfa sayfa çekilir.
+    """
+
+    def __init__(self, path=RESULTS_DB):
+        self.path = path
+        self._sync_lock = threading.Lock()
+        # SQLite'ın meşgul bekleme döngüsü yerine yazmalar süreç içinde sıraya girer
+        self._write_lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            if self._get_meta(con, 'schema_version') != SCHEMA_VERSION:
+                # Şema değişti: tablo kanonik alanlarla yeniden kurulur, bir kez tam senkron yapılır
+                con.execute("DROP TABLE IF EXISTS results")
+                con.execute("DELETE FROM meta WHERE key IN ('watermark', 'full_sync_done')")
+                con.execute("INSERT OR REPLACE INTO meta VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    doc_id TEXT PRIMARY KEY,
+                    ad_soyad TEXT, no TEXT,
+                    on_test INTEGER, son_test INTEGER, toplam_soru INTEGER,
+                    yanlislar TEXT, ders_surumu TEXT,
+                    guncelleme REAL
+                )""")
+            # Firestore'a henüz yazılmamış gönderimler (süreç çökse bile kaybolmaz)
+            con.execute("CREATE TABLE IF NOT EXISTS outbox (no TEXT PRIMARY KEY, seq INTEGER, record TEXT)")
+            # Defalarca yazılamayan gönderimler (kuyruğu tıkamasın diye ayrılır, silinmez)
+            con.execute("CREATE TABLE IF NOT EXISTS dead_letter (no TEXT PRIMARY KEY, seq INTEGER, record TEXT, error TEXT, failed_at REAL)")
+
+    @contextmanager
+    def _connect(self):
+        # Her çağrıda yeni bağlantı: Streamlit oturumları farklı thread'lerde çalışır
+        con = sqlite3.connect(self.path, timeout=30)
+        con.execute("PRAGMA synchronous=NORMAL")
+        try:
+            with con:
+                yield con
+        finally:
+            con.close()
+
+    def _get_meta(self, con, key):
+        row = con.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def upsert(self, con, doc_id, record):
+        # Eski alanlar yerel önbelleğe yazılırken bir kez taşınır
+        record = migrate_record(record)
+        ts = record.get('guncelleme')
+        if isinstance(ts, datetime):
+            ts = ts.timestamp()
+        yanlislar = record.get('yanlislar')
+        con.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                doc_id, record.get('ad_soyad'),
+                None if record.get('no') is None else str(record.get('no')),
+                record.get('on_test'), record.get('son_test'), record.get('toplam_soru'),
+                None if yanlislar is None else json.dumps(yanlislar),
+                record.get('ders_surumu'), ts,
+            ),
+        )
+        return ts
+
+    def sync(self, db, page_size=SYNC_PAGE_SIZE):
+        """Firestore'dan yeni/değişen kayıtları çeker. Çekilen belge sayısını döndürür."""
+        from firebase_admin import firestore
+        with self._sync_lock, self._connect() as con:
+            full_done = self._get_meta(con, 'full_sync_done') == '1'
+            watermark = float(self._get_meta(con, 'watermark') or 0)
+            col = db.collection(RESULTS_COLLECTION).select(RESULT_FIELDS)
+
+            if full_done:
+                # Eşit zaman damgalı kayıt kaçmasın diye >= ile sorgulanır; upsert tekrarı zararsız
+                since = datetime.fromtimestamp(watermark, tz=timezone.utc)
+                query = (col.where(filter=firestore.FieldFilter('guncelleme', '>=', since))
+                            .order_by('guncelleme'))
+            else:
+                # İlk senkron: 'guncelleme' alanı olmayan eski kayıtlar da gelsin diye belge kimliğine göre
+                query = col.order_by(firestore.FieldPath.document_id())
+
+            fetched = 0
+            last = None
+            while True:
+                page = query.limit(page_size)
+                if last is not None:
+                    page = page.start_after(last)
+                docs = list(page.stream())
+                for doc in docs:
+                    ts = self.upsert(con, doc.id, doc.to_dict())
+                    if ts:
+                        watermark = max(watermark, ts)
+                fetched += len(docs)
+                if len(docs) < page_size:
+                    break
+                last = docs[-1]
+
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('watermark', ?)", (str(watermark),))
+            con.execute("INSERT OR REPLACE INTO meta VALUES ('full_sync_done', '1')")
+            return fetched
+
+    # --- GİDEN KUTUSU (OUTBOX) ---
+    def outbox_put(self, no, seq, record):
+        with self._write_lock, self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO outbox VALUES (?, ?, ?)",
+                        (str(no), seq, json.dumps(record, ensure_ascii=False)))
+
+    def outbox_remove(self, items):
+        """(no, seq) çiftlerini siler; bu arada daha yeni bir gönderim geldiyse ona dokunmaz."""
+        with self._write_lock, self._connect() as con:
+            con.executemany("DELETE FROM outbox WHERE no = ? AND seq = ?", [(str(no), seq) for no, seq in items])
+
+    def outbox_count(self):
+        with self._connect() as con:
+            return con.execute("SELECT COUNT(*) FROM outbox").fetchone()[0]
+
+    def outbox_all(self):
+        with self._connect() as con:
+            rows = con.execute("SELECT no, seq, record FROM outbox ORDER BY seq").fetchall()
+        return [(no, seq, json.loads(record)) for no, seq, record in rows]
+
+    def outbox_dead(self, no, seq, record, error):
+        """Gönderimi giden kutusundan bekletilenlere taşır."""
+        with self._write_lock, self._connect() as con:
+            con.execute("INSERT OR REPLACE INTO dead_letter VALUES (?, ?, ?, ?, ?)",
+                        (str(no), seq, json.dumps(record, ensure_ascii=False), error, time.time()))
+            con.execute("DELETE FROM outbox WHERE no = ? AND seq = ?", (str(no), seq))
+
+    def dead_letters(self):
+        """Bekletilen gönderimler, en yeniden eskiye: (no, hata, zaman)."""
+        with self._connect() as con:
+            return con.execute("SELECT no, error, failed_at FROM dead_letter ORDER BY failed_at DESC").fetchall()
+
+    def dead_requeue(self):
+        """Bekletilenleri giden kutusuna geri koyar; öğrencinin daha yeni gönderimi varsa ona dokunmaz."""
+        with self._write_lock, self._connect() as con:
+            rows = con.execute("SELECT no, seq, record FROM dead_letter ORDER BY seq").fetchall()
+            con.executemany("INSERT OR IGNORE INTO outbox VALUES (?, ?, ?)", rows)
+            con.execute("DELETE FROM dead_letter")
+        return [(no, seq, json.loads(record)) for no, seq, record in rows]
+
+    def records(self, lesson=None):
+        """Kayıtları Firestore belgesiyle aynı biçimde (boş alanlar olmadan) döndürür."""
+        with self._connect() as con:
+            con.row_factory = sqlite3.Row
+            sql = "SELECT * FROM results"
+            args = ()
+            if lesson is not None:
+                sql += " WHERE ders_surumu = ?"
+                args = (lesson,)
+            rows = con.execute(sql + " ORDER BY doc_id", args).fetchall()
+        out = []
+        for row in rows:
+            record = {k: row[k] for k in row.keys() if k != 'doc_id' and row[k] is not None}
+            if 'yanlislar' in record:
+                record['yanlislar'] = json.loads(record['yanlislar'])
+            out.append(record)
+        return out
+
+    def count(self, lesson):
+        """Derse ait kayıt sayısı; ders sürümü olmayan eski kayıtlar DEFAULT_LESSON sayılır (bkz. lesson_of)."""
+        sql = "SELECT COUNT(*) FROM results WHERE ders_surumu = ?"
+        if lesson == DEFAULT_LESSON:
+            sql += " OR ders_surumu IS NULL"
+        with self._connect() as con:
+            return con.execute(sql, (lesson,)).fetchone()[0]
+
+    def _frame_query(self, lesson):
+        sql = f"SELECT {', '.join(RESULT_SCHEMA)} FROM results"
+        args = ()
+        if lesson is not None:
+            sql += " WHERE ders_surumu = ?"
+            args = (lesson,)
+        return sql + " ORDER BY doc_id", args
+
+    def records_frame(self, lesson=None):
+        """Tablo için gereken sütunları doğrudan DataFrame olarak okur."""
+        sql, args = self._frame_query(lesson)
+        with self._connect() as con:
+            return pd.read_sql_query(sql, con, params=args)
+
+    def iter_frames(self, lesson=None, chunksize=EXPORT_CHUNK_ROWS):
+        """Aynı sorguyu parça parça okur; bellekte aynı anda tek parça durur."""
+        sql, args = self._frame_query(lesson)
+        with self._connect() as con:
+            yield from pd.read_sql_query(sql, con, params=args, chunksize=chunksize)
+
+
+results_store = ResultsStore()
+
+
+# --- DIŞA AKTARIM (CSV / PARQUET) ---
+def export_csv(out, soru_sayisi, lesson=None, store=results_store):
+    """Excel uyumlu (';' ayraçlı, UTF-8 BOM'lu) CSV'yi parça parça yazar."""
+    text = io.TextIOWrapper(out, encoding='utf-8-sig', newline='')
+    header = True
+    for chunk in store.iter_frames(lesson):
+        format_data_for_csv(chunk, soru_sayisi).to_csv(text, sep=';', index=False, header=header)
+        header = False
+    if header:
+        # Hiç kayıt yoksa sadece başlık satırı
+        text.write(";".join(TABLE_COLUMNS) + "\n")
+    text.flush()
+    text.detach()
+
+
+def export_parquet(out, soru_sayisi, lesson=None, store=results_store):
+    """Analiz için sütunsal Parquet dosyasını parça parça (row group) yazar."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Parçalar arasında şema sabit kalsın (kategorik kod tipi parçaya göre değişebiliyor)
+    schema = pa.schema([
+        ('Ad Soyad', pa.dictionary(pa.int32(), pa.string())),
+        ('Öğrenci No', pa.string()),
+        ('Soru Sayısı', pa.int16()),
+        ('1. Test Doğru Sayısı', pa.int16()),
+        ('2. Test Doğru Sayısı', pa.int16()),
+        ('NET', pa.int16()),
+    ])
+    with pq.ParquetWriter(out, schema) as writer:
+        for chunk in store.iter_frames(lesson):
+            table = format_data_for_csv(chunk, soru_sayisi)
+            writer.write_table(pa.Table.from_pandas(table, schema=schema, preserve_index=False))
+
+
+def export_results(fmt, soru_sayisi, lesson=None, store=results_store):
+    """
+    Dışa aktarımı diskteki geçici dosyaya parça parça yazar ve baytlarını döndürür
+    (st.download_button dosya nesnesi türlerinden yalnızca bayt/BytesIO/BufferedReader
+    kabul eder; veriyi zaten belleğe alır). Tablonun tamamı DataFrame olarak bellekte durmaz.
+    """
+    with tempfile.TemporaryFile() as out:
+        if fmt == 'parquet':
+            export_parquet(out, soru_sayisi, lesson, store)
+        else:
+            export_csv(out, soru_sayisi, lesson, store)
+        out.seek(0)
+        return out.read()
@@ -0,0 +1,146 @@
+# --- SINAV GÖNDERİM KUYRUĞU ---
+# Sınıfın tamamı aynı anda "Sınavı Bitir"e bastığında her oturumun Firestore'a
+# tek tek yazması yerine gönderimler yerel giden kutusuna (SQLite) yazılıp
+# hemen onaylanır. Arka plandaki tek yazıcı thread bunları gruplar halinde tek
+# transaction ile gönderir, hata olursa üstel bekleme + rastgele sapma ile tekrar dener.
+# Tek başına MAX_ATTEMPTS kez yazılamayan gönderim (bozuk kayıt, kalıcı ret)
+# kuyruğu tıkamasın diye bekletilenlere (dead letter) ayrılır; yönetici
+# panelinden tekrar denenebilir. Bağlantı kesintisi / servis yok hataları
+# kayda ait sayılmaz: grup küçültülmez, deneme sayılmaz, yalnızca beklenir.
+import time
+import random
+import itertools
+import threading
+from collections import OrderedDict
+
+from metrics import observe, timer
+from results import results_store, save_batch_with_aggregate
+
+BATCH_SIZE = 100        # Bir transaction'daki en fazla öğrenci (Firestore sınırı 500 yazma)
+LINGER_S = 0.5          # Yazmadan önce aynı anda gelenlerin birikmesi için beklenen süre
+BASE_DELAY_S = 0.5
+MAX_DELAY_S = 30.0
+MAX_ATTEMPTS = 5        # Tek kayıtlık gönderimde bu kadar hatadan sonra bekletilir
+# google.api_core'u yüklemeden tanınan geçici (kayıttan bağımsız) hata türleri
+TRANSIENT_ERRORS = ("ServiceUnavailable", "DeadlineExceeded", "GatewayTimeout", "TooManyRequests", "RetryError")
+
+
+def is_transient(error):
+    """Bağlantı kesintisi, zaman aşımı ya da servisin geçici olarak yanıt vermemesi mi?"""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(error).__mro__)
+
+
+class SubmissionQueue:
+    def __init__(self, db, store=results_store, batch_size=BATCH_SIZE, linger_s=LINGER_S):
+        self.db = db
+        self.store = store
+        self.batch_size = batch_size
+        self.linger_s = linger_s
+        self._cond = threading.Condition()
+        self._pending = OrderedDict()   # no -> (seq, record); aynı no'nun son gönderimi geçerli
+        self._seq = itertools.count(int(time.time() * 1000))
+        self._failures = 0
+        self._limit = batch_size        # Hata alınca küçülür; bozuk kayıt diğerlerini bekletmesin
+        self._attempts = {}             # no -> tek başına başarısız deneme sayısı
+        self.last_error = None
+
+        # Önceki süreçten kalan, yazılamamış gönderimleri geri yükle
+        for no, seq, record in store.outbox_all():
+            self._pending[no] = (seq, record)
+
+        self._thread = threading.Thread(target=self._run, name="exam-submissions", daemon=True)
+        self._thread.start()
+
+    def submit(self, record):
+        """Kaydı giden kutusuna yazar ve hemen döner (yerel onay)."""
+        no = str(record['no'])
+        seq = next(self._seq)
+        self.store.outbox_put(no, seq, record)
+        with self._cond:
+            self._pending.pop(no, None)
+            self._attempts.pop(no, None)
+            self._pending[no] = (seq, record)
+            self._cond.notify()
+        return True
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def dead_letters(self):
+        """Bekletilen gönderimler: (no, hata, zaman), en yeni önce."""
+        return self.store.dead_letters()
+
+    def retry_dead(self):
+        """Bekletilen gönderimleri tekrar kuyruğa alır. Alınan sayıyı döner."""
+        items = self.store.dead_requeue()
+        with self._cond:
+            for no, seq, record in items:
+                if no not in self._pending:
+                    self._pending[no] = (seq, record)
+            self._cond.notify()
+        return len(items)
+
+    def _take_batch(self):
+        with self._cond:
+            while not self._pending:
+                self._cond.wait()
+        # Aynı anda gelen gönderimler birikip tek transaction'a girsin
+        time.sleep(self.linger_s)
+        with self._cond:
+            return list(itertools.islice(self._pending.items(), self._limit))
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                with timer("firestore_gonderim") as m:
+                    m.record('rows', len(batch))
+                    save_batch_with_aggregate(self.db, [record for _, (_, record) in batch])
+            except Exception as e:
+                self.last_error = e
+                self._failures += 1
+                if is_transient(e):
+                    # Firestore'a ulaşılamıyor; kayıtların suçu yok
+                    pass
+                elif len(batch) > 1:
+                    self._limit = max(1, len(batch) // 2)
+                else:
+                    self._fail_single(batch[0], e)
+                # Üstel bekleme, tam rastgele sapma (full jitter)
+                delay = min(MAX_DELAY_S, BASE_DELAY_S * 2 ** self._failures)
+                time.sleep(random.uniform(0, delay))
+                continue
+
+            observe("firestore_gonderim", 'retries', self._failures)
+            self._failures = 0
+            self._limit = self.batch_size
+            self.last_error = None
+            done = [(no, seq) for no, (seq, _) in batch]
+            self.store.outbox_remove(done)
+            with self._cond:
+                for no, seq in done:
+                    # Bu arada aynı öğrenciden yeni gönderim geldiyse kuyrukta kalsın
+                    if no in self._pending and self._pending[no][0] == seq:
+                        del self._pending[no]
+                        self._attempts.pop(no, None)
+
+    def _fail_single(self, item, error):
+        # Tek kayıt da yazılamadı: sıranın sonuna alınır, MAX_ATTEMPTS'te bekletilir
+        no, (seq, record) = item
+        with self._cond:
+            current = self._pending.get(no)
+            if current is None or current[0] != seq:
+                # Bu arada daha yeni gönderim geldi; onun denemesi sıfırdan başlar
+                return
+            attempts = self._attempts.get(no, 0) + 1
+            if attempts < MAX_ATTEMPTS:
+                self._attempts[no] = attempts
+                self._pending.move_to_end(no)
+                return
+            del self._pending[no]
+            self._attempts.pop(no, None)
+        observe("firestore_gonderim_bekletilen", 'rows', 1)
+        self.store.outbox_dead(no, seq, record, f"{type(error).__name__}: {error}")
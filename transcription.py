@@ -0,0 +1,350 @@
+# --- TRANSKRİPSİYON YARDIMCILARI ---
+# Uzun ders videolarını sessiz noktalardan parçalara bölüp seçilen motorla
+# (bkz. asr.py) çok çekirdekte paralel olarak yazıya döker.
+# Yeniden kesilip yüklenen derslerde değişmeyen parçaların transkripti tekrar
+# kullanılabilsin diye ses içerik tanımlı noktalardan bölünür ve her parçanın
+# ses zarfından parmak izi çıkarılır (bkz. split_stable, SegmentIndex).
+# Process havuzu 'spawn' ile açıldığı için bu fonksiyonların app3.py dışında,
+# import edilebilir bir modülde durması gerekiyor.
+import os
+import time
+import itertools
+import threading
+import subprocess
+import tempfile
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from asr import ASR_ENGINE, ASR_MODEL, load_backend
+
+SAMPLE_RATE = 16000
+
+# Varsayılan: her çekirdeğe bir işçi (en fazla 8, bellek için)
+DEFAULT_WORKERS = max(1, min(8, (os.cpu_count() or 1)))
+# Her işçi modeli kendi belleğinde tutar; bu kadar süre iş gelmezse havuz kapatılır
+POOL_IDLE_S = int(os.environ.get("POOL_IDLE_S", "600"))
+
+# Parça boyu ayarları (saniye)
+MAX_SEGMENT_S = 300
+FRAME_S = 0.03           # Enerji ölçümü için çerçeve uzunluğu
+
+# İçerik tanımlı parçalama ve parmak izi ayarları
+STABLE_SEGMENT_S = 60            # Kesim: kendi ±30 sn çevresindeki en uzun duraklama
+PAUSE_FRAME_S = 0.01             # Duraklama uzunlukları bu çözünürlükte ölçülür
+PAUSE_MARGIN_DB = 10.0           # Yakın çevrenin gürültü tabanının bu kadar üstüne kadar sessizlik sayılır
+MIN_PAUSE_S = 0.2                # Daha kısa duraklamalar kesim adayı değil
+PAUSE_TIE_S = 0.1                # En uzundan bu kadar kısa duraklamalar da eşit sayılır (kayma/gürültü payı)
+FINGERPRINT_FRAMES = 8           # Parmak izinde bir değer = 8 çerçeve (~0.24 sn) ses düzeyi
+SILENCE_FLOOR_DB = -60.0         # Bunun altı sessizlik sayılır (gürültü tabanı farkları yok sayılır)
+FINGERPRINT_TOLERANCE_DB = 6.0   # Yeniden kodlama / kesim kayması ses düzeyini bu kadar oynatabilir
+FINGERPRINT_MATCH_RATIO = 0.95   # Değerlerin en az bu oranı tolerans içinde olmalı
+MAX_MISMATCH_BINS = 2            # ve uyuşmayan değerler art arda ~0.5 sn'yi geçmemeli (değişen söz)
+MAX_SHIFT_BINS = 8               # Kesim noktası sessizlik içinde ~2 sn kayabilir
+
+
+PIPE_CHUNK = 1024 * 1024
+
+
+# --- SES ÇIKARMA (FFMPEG -> PIPE) ---
+def extract_pcm(video_path):
+    """
+    ffmpeg ile videodan 16 kHz mono 16-bit PCM çıkarır ve doğrudan pipe'tan okur.
+    Ara MP3 dosyası yazılmaz; geriye int16 numpy dizisi döner.
+    """
+    command = [
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-i", video_path,
+        "-vn", "-f", "s16le", "-acodec", "pcm_s16le",
+        "-ar", str(SAMPLE_RATE), "-ac", "1", "-",
+    ]
+    buf = bytearray()
+    # stderr dosyaya gider; pipe dolup ffmpeg'i kilitlemesin
+    with tempfile.TemporaryFile() as err:
+        proc = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=err)
+        for chunk in iter(lambda: proc.stdout.read(PIPE_CHUNK), b""):
+            buf += chunk
+        proc.stdout.close()
+        if proc.wait() != 0:
+            err.seek(0)
+            raise RuntimeError(f"Video ses dönüştürme hatası (FFmpeg): {err.read().decode('utf-8', 'replace')}")
+    if not buf:
+        raise RuntimeError("Ses dosyası oluşturulamadı veya boş.")
+    return np.frombuffer(buf, dtype=np.int16)
+
+
+def frame_energy(audio, frame_s=FRAME_S):
+    """Çerçeve (frame_s) başına RMS enerji."""
+    frame = int(frame_s * SAMPLE_RATE)
+    n_frames = len(audio) // frame
+    frames = audio[:n_frames * frame].reshape(n_frames, frame)
+    # Bloklar halinde hesapla; tüm sesin float kopyası bellekte oluşmasın
+    energy = np.empty(n_frames, dtype=np.float32)
+    block = 10000
+    for i in range(0, n_frames, block):
+        part = frames[i:i + block].astype(np.float32)
+        energy[i:i + block] = np.sqrt(np.mean(part ** 2, axis=1))
+    return energy
+
+
+# --- İÇERİK TANIMLI PARÇALAMA ---
+def _pauses(energy, half):
+    """
+    Sessiz çerçeve dizileri: (orta_çerçeve, uzunluk). Eşik, ±half çerçevelik
+    çevrenin gürültü tabanına göredir; tüm sese ait bir istatistik olsaydı bir
+    yerdeki değişiklik her yerdeki duraklama uzunluklarını oynatırdı.
+    """
+    db = 20 * np.log10(np.maximum(energy, 1e-3) / 32768)
+    block = int(1 / PAUSE_FRAME_S)
+    n_blocks = -(-len(db) // block)
+    block_min = np.pad(db, (0, n_blocks * block - len(db)), mode='edge').reshape(n_blocks, block).min(axis=1)
+    w = half // block
+    floor = np.percentile(np.lib.stride_tricks.sliding_window_view(np.pad(block_min, w, mode='edge'), 2 * w + 1), 10, axis=1)
+    silent = db < np.repeat(floor, block)[:len(db)] + PAUSE_MARGIN_DB
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], silent.astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+    keep = ends - starts >= int(MIN_PAUSE_S / PAUSE_FRAME_S)
+    return (starts[keep] + ends[keep]) // 2, ends[keep] - starts[keep]
+
+
+def split_stable(audio):
+    """
+    Sesi yalnızca yakın çevresine bakarak seçilen duraklamalardan böler: bir
+    duraklama, ±STABLE_SEGMENT_S/2 çevresindeki en uzun duraklamaysa ortasından
+    kesilir. Kesim kararı sesin başından olan uzaklığa ya da önceki kesime bağlı
+    olmadığından, videonun bir bölümü kesilip ya da yeniden çekilip yüklendiğinde
+    değişikliğin uzağındaki kesimler aynı içerik noktalarına düşer. Duraklama
+    uzunluğu yeniden kodlamada neredeyse değişmez (en sessiz çerçeve ise gürültüyle
+    yer değiştirir).
+    """
+    total = len(audio)
+    frame = int(PAUSE_FRAME_S * SAMPLE_RATE)
+    energy = frame_energy(audio, PAUSE_FRAME_S)
+    n_frames = len(energy)
+    half = int(STABLE_SEGMENT_S / 2 / PAUSE_FRAME_S)
+    if n_frames <= 2 * half:
+        return [(0, total)]
+
+    centers, lengths = _pauses(energy, half)
+    tie = int(PAUSE_TIE_S / PAUSE_FRAME_S)
+    # Aday: çevresindeki en uzun duraklama (neredeyse eşit uzunluktakiler de; hangisinin
+    # kazanacağı gürültüyle değişebilir)
+    candidates = []
+    for center, length in zip(centers, lengths):
+        lo, hi = np.searchsorted(centers, [center - half, center + half + 1])
+        if length + tie >= lengths[lo:hi].max():
+            candidates.append(int(center))
+    # Kesim: önceki yarım pencerede başka aday olmayan aday. Karar yine yalnızca
+    # yakın çevreye bakar (önceki kesime değil), kesimler en az yarım pencere arayla düşer.
+    cuts = [0]
+    for prev, center in zip([None] + candidates, candidates):
+        if (prev is None or center - prev >= half) and center >= half and n_frames - center >= half:
+            cuts.append(center)
+    cuts.append(n_frames)
+
+    # Duraklamasız uzun bölümleri kendi içindeki en sessiz noktadan böl
+    max_frames = int(MAX_SEGMENT_S / PAUSE_FRAME_S)
+    i = 0
+    while i < len(cuts) - 1:
+        lo, hi = cuts[i], cuts[i + 1]
+        if hi - lo > max_frames:
+            cuts.insert(i + 1, lo + half + int(np.argmin(energy[lo + half:hi - half])))
+        else:
+            i += 1
+
+    bounds = [c * frame for c in cuts[:-1]] + [total]
+    return [(bounds[i], bounds[i + 1]) for i in range(len(bounds) - 1)]
+
+
+def fingerprint(audio):
+    """
+    Parçanın ses zarfı: ~0.24 sn'lik dilimlerin dBFS düzeyi (tam sayı listesi).
+    Yeniden kodlama ve örnek kaymalarına dayanıklıdır; içerik değişince bozulur.
+    """
+    energy = frame_energy(audio)
+    n = len(energy) // FINGERPRINT_FRAMES
+    if n == 0:
+        return []
+    # dB'lerin ortalaması: dilim sınırına denk gelen kısa bir ses başlangıcı değeri sıçratmaz
+    db = np.clip(20 * np.log10(np.maximum(energy[:n * FINGERPRINT_FRAMES], 1e-3) / 32768), SILENCE_FLOOR_DB, 0)
+    return np.round(db.reshape(n, FINGERPRINT_FRAMES).mean(axis=1)).astype(int).tolist()
+
+
+def fingerprints_match(a, b):
+    """
+    İki parmak izi, kesim noktası ±MAX_SHIFT_BINS kaymış olsa da aynı sesi mi gösteriyor?
+    Gürültü tek tük uyuşmazlık üretir; değişen bir söz ise art arda uyuşmazlık.
+    """
+    if not a or not b or abs(len(a) - len(b)) > MAX_SHIFT_BINS:
+        return False
+    a = np.asarray(a, dtype=np.float32)
+    b = np.asarray(b, dtype=np.float32)
+    longest = max(len(a), len(b))
+    for shift in range(-MAX_SHIFT_BINS, MAX_SHIFT_BINS + 1):
+        lo, hi = max(0, -shift), min(len(a), len(b) - shift)
+        if hi - lo < longest - MAX_SHIFT_BINS:
+            continue
+        bad = np.abs(a[lo:hi] - b[lo + shift:hi + shift]) > FINGERPRINT_TOLERANCE_DB
+        if 1 - bad.mean() >= FINGERPRINT_MATCH_RATIO and _longest_run(bad) <= MAX_MISMATCH_BINS:
+            return True
+    return False
+
+
+def _longest_run(flags):
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], flags.astype(np.int8), [0]))))
+    return int((edges[1::2] - edges[::2]).max()) if len(edges) else 0
+
+
+class SegmentIndex:
+    """
+    Önceki yüklemelerin parçaları (parmak izi + parça transkripti).
+    Adaylar uzunluk kovalarından bulunur, ardından parmak izleri karşılaştırılır.
+    """
+
+    def __init__(self):
+        self._buckets = {}
+
+    def add(self, entries):
+        for entry in entries:
+            if entry.get('fp'):
+                self._buckets.setdefault(len(entry['fp']) // MAX_SHIFT_BINS, []).append(entry)
+
+    def find(self, fp):
+        if not fp:
+            return None
+        k = len(fp) // MAX_SHIFT_BINS
+        for bucket in (k, k - 1, k + 1):
+            for entry in self._buckets.get(bucket, ()):
+                if fingerprints_match(fp, entry['fp']):
+                    return entry
+        return None
+
+
+# --- İŞÇİ SÜRECİ ---
+_worker_backend = None
+
+
+def _worker_init(engine, model_name, threads):
+    global _worker_backend
+    _worker_backend = load_backend(engine, model_name, threads)
+
+
+def _transcribe_segment(audio, language, backend=None):
+    res = (backend or _worker_backend).transcribe(audio, language=language)
+    segments = []
+    for seg in res.get('segments', []):
+        seg = dict(seg)
+        seg['start'] = round(seg['start'], 2)
+        seg['end'] = round(seg['end'], 2)
+        segments.append(seg)
+    return {'text': res.get('text', '').strip(), 'segments': segments, 'language': res.get('language')}
+
+
+# Havuz art arda gelen işler arasında açık kalır; modeller her derste yeniden
+# yüklenmez. POOL_IDLE_S boyunca kullanılmayan ya da bozulan (işçisi ölen) havuz
+# kapatılır, sonraki iş yeni havuz açar.
+_pools = {}             # (motor, model, işçi) -> [havuz, kullanan iş sayısı, son kullanım]
+_pools_lock = threading.Lock()
+
+
+def _acquire_pool(key):
+    engine, model_name, workers = key
+    with _pools_lock:
+        if key not in _pools:
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            pool = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=mp.get_context("spawn"),
+                initializer=_worker_init,
+                initargs=(engine, model_name, threads),
+            )
+            _pools[key] = [pool, 0, time.time()]
+        entry = _pools[key]
+        entry[1] += 1
+        return entry[0]
+
+
+def _release_pool(key, pool, broken=False):
+    with _pools_lock:
+        entry = _pools.get(key)
+        if entry is None or entry[0] is not pool:
+            return
+        entry[1] -= 1
+        entry[2] = time.time()
+        if broken:
+            del _pools[key]
+        elif entry[1] == 0:
+            timer = threading.Timer(POOL_IDLE_S, _shutdown_idle)
+            timer.daemon = True
+            timer.start()
+    if broken:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _shutdown_idle():
+    now = time.time()
+    with _pools_lock:
+        idle = [key for key, (_, users, last) in _pools.items() if users == 0 and now - last >= POOL_IDLE_S]
+        pools = [_pools.pop(key)[0] for key in idle]
+    for pool in pools:
+        pool.shutdown(wait=False)
+
+
+def transcribe_spans(audio, bounds, engine=ASR_ENGINE, model_name=ASR_MODEL, workers=DEFAULT_WORKERS,
+                     language=None, progress=None, backend=None):
+    """
+    Verilen (başlangıç, bitiş) aralıklarını yazıya döker; aralık başına text/segments/language
+    döner, segment zamanları aralığın başına göredir (bkz. merge_parts).
+    backend verilirse havuz yerine bu süreçte, sırayla çalışır.
+    """
+    if not bounds:
+        # Hepsi önbellekten geldi; havuz (ve modeller) hiç açılmasın
+        return []
+    if backend is not None:
+        parts = []
+        for i, (s, e) in enumerate(bounds):
+            parts.append(_transcribe_segment(np.asarray(audio[s:e]), language, backend))
+            if progress is not None:
+                progress(i + 1, len(bounds))
+        return parts
+    key = (engine, model_name, workers)
+    pool = _acquire_pool(key)
+    broken = False
+    try:
+        futures = [
+            pool.submit(_transcribe_segment, np.asarray(audio[s:e]), language)
+            for s, e in bounds
+        ]
+        if progress is not None:
+            done = itertools.count(1)
+            for f in futures:
+                f.add_done_callback(lambda _: progress(next(done), len(futures)))
+        # Sonuçlar gönderim sırasıyla toplanır, böylece metin sırası korunur
+        return [f.result() for f in futures]
+    except BrokenProcessPool as e:
+        # İşçi öldü (ör. bellek yetmedi) ya da model yüklenemedi; havuz atılır
+        broken = True
+        raise RuntimeError("Transkripsiyon işçisi beklenmedik şekilde kapandı (bellek yetmemiş olabilir); "
+                           "iş kaldığı yerden devam ettirilebilir.") from e
+    finally:
+        _release_pool(key, pool, broken)
+
+
+def merge_parts(parts, offsets, language=None):
+    """Parça sonuçlarını whisper transcribe() biçiminde birleştirir; segment zamanlarına offsets (sn) eklenir."""
+    segments = []
+    for part, offset in zip(parts, offsets):
+        for seg in part['segments']:
+            seg = dict(seg)
+            seg['start'] = round(seg['start'] + offset, 2)
+            seg['end'] = round(seg['end'] + offset, 2)
+            seg['id'] = len(segments)
+            segments.append(seg)
+
+    languages = [p['language'] for p in parts if p['language']]
+    return {
+        'text': " ".join(p['text'] for p in parts if p['text']),
+        'segments': segments,
+        'language': max(set(languages), key=languages.count) if languages else language,
+    }
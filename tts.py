@@ -0,0 +1,234 @@
+# --- SESLENDİRME (TTS) ÖNBELLEĞİ ---
+# Aynı metin, ses ve hız için OpenAI'ye tek bir kez gidilir; sonuç diskte
+# tutulur ve tüm oturumlar (ve aynı sunucudaki süreçler) tarafından paylaşılır.
+# Aynı anahtar için eşzamanlı gelen istekler tek bir API çağrısında birleşir.
+# Uzun metinler cümle sınırlarından parçalara bölünüp sınırlı bir havuzda
+# paralel seslendirilir; ilk parça hazır olur olmaz çalınabilir, parçalar
+# yeniden kodlanmadan (MP3 çerçeveleri uç uca) tek dosyada birleştirilir.
+import os
+import re
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from cache import CACHE_DIR, DiskCache, make_key
+
+TTS_MODEL = "tts-1"
+TTS_VOICE = "alloy"
+TTS_CACHE_MAX_MB = int(os.environ.get("TTS_CACHE_MAX_MB", "1024"))
+
+# Öğrenci ekranındaki hız seçenekleri (select_slider ile aynı liste)
+AUDIO_SPEEDS = [0.75, 1.0, 1.25, 1.5, 2.0]
+PREGEN_WORKERS = int(os.environ.get("TTS_PREGEN_WORKERS", "4"))
+# Parça başına en fazla karakter (0: parçalama kapalı) ve eşzamanlı parça isteği
+TTS_CHUNK_CHARS = int(os.environ.get("TTS_CHUNK_CHARS", "400"))
+TTS_CHUNK_WORKERS = int(os.environ.get("TTS_CHUNK_WORKERS", "4"))
+
+tts_cache = DiskCache(os.path.join(CACHE_DIR, "tts"), TTS_CACHE_MAX_MB * 1024 * 1024)
+
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def tts_key(text, speed, voice=TTS_VOICE, model=TTS_MODEL):
+    return make_key(text, voice, model, float(speed))
+
+
+def cached_audio_path(text, speed, voice=TTS_VOICE, model=TTS_MODEL):
+    """Ses önbellekte varsa dosya yolunu, yoksa None döndürür (API çağrısı yapmaz)."""
+    return tts_cache.get_path(tts_key(text, speed, voice, model), "audio.mp3")
+
+
+def synthesize(client, text, speed, voice=TTS_VOICE, model=TTS_MODEL):
+    """Metni seslendirir ve önbellekteki MP3 dosyasının yolunu döndürür."""
+    key = tts_key(text, speed, voice, model)
+    path = tts_cache.get_path(key, "audio.mp3")
+    if path is not None:
+        return path
+
+    with _inflight_lock:
+        fut = _inflight.get(key)
+        owner = fut is None
+        if owner:
+            fut = Future()
+            _inflight[key] = fut
+    if not owner:
+        # Aynı ses şu an başka bir oturum için üretiliyor; onun sonucunu bekle
+        return fut.result()
+
+    try:
+        # Kilidi almadan önce başka biri bitirmiş olabilir
+        path = tts_cache.get_path(key, "audio.mp3")
+        if path is None:
+            response = client.audio.speech.create(model=model, voice=voice, input=text, speed=speed)
+            path = tts_cache.put_bytes(key, "audio.mp3", response.content)
+        fut.set_result(path)
+        return path
+    except Exception as e:
+        fut.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            _inflight.pop(key, None)
+
+
+# --- PARÇALI SESLENDİRME ---
+_SENTENCE_END = re.compile(r'(?<=[.!?…:;])\s+')
+_chunk_pool = ThreadPoolExecutor(max_workers=TTS_CHUNK_WORKERS, thread_name_prefix="tts-chunk")
+
+
+def split_text(text, max_chars=TTS_CHUNK_CHARS):
+    """
+    Metni cümle sınırlarından en fazla max_chars karakterlik parçalara böler.
+    Tek başına sınırı aşan cümle boşluklardan bölünür. İlk parça kısa tutulur
+    ki ilk ses çabuk gelsin.
+    """
+    text = text.strip()
+    if not max_chars or len(text) <= max_chars:
+        return [text]
+    chunks, current = [], ""
+    limit = max_chars // 2   # İlk parça için
+    for sentence in _SENTENCE_END.split(text):
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(' ', 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if current and len(current) + 1 + len(sentence) > (limit if not chunks else max_chars):
+            chunks.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}" if current else sentence
+    if current:
+        chunks.append(current)
+    return [c for c in chunks if c]
+
+
+def _strip_tags(data):
+    """MP3 baytlarının başındaki ID3v2 ve sonundaki ID3v1 etiketini atar (yalnızca çerçeveler kalır)."""
+    if data[:3] == b"ID3" and len(data) >= 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        data = data[10 + size:]
+    if len(data) >= 128 and data[-128:-125] == b"TAG":
+        data = data[:-128]
+    return data
+
+
+# Layer III bit hızları (kbps), indeks 1..14: MPEG-1 ve MPEG-2/2.5
+_MP3_BITRATES = {
+    1: (32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+
+def mp3_seconds(path):
+    """Sabit bit hızlı MP3'ün süresini ilk çerçeve başlığından tahmin eder; bulunamazsa None."""
+    with open(path, 'rb') as f:
+        data = _strip_tags(f.read())
+    i = data.find(b"\xff")
+    while 0 <= i < len(data) - 3:
+        b1, b2 = data[i + 1], data[i + 2]
+        # Çerçeve eşleşmesi + Layer III + geçerli bit hızı indeksi
+        if b1 & 0xE0 == 0xE0 and (b1 >> 1) & 3 == 1 and 0 < b2 >> 4 < 15:
+            kbps = _MP3_BITRATES[1 if (b1 >> 3) & 3 == 3 else 2][(b2 >> 4) - 1]
+            return (len(data) - i) * 8 / (kbps * 1000)
+        i = data.find(b"\xff", i + 1)
+    return None
+
+
+def join_mp3(paths):
+    """MP3 dosyalarını yeniden kodlamadan birleştirir; ilk dosyanın başlığı korunur."""
+    parts = []
+    for i, path in enumerate(paths):
+        with open(path, 'rb') as f:
+            data = f.read()
+        parts.append(data if i == 0 else _strip_tags(data))
+    return b"".join(parts)
+
+
+def synthesize_chunks(client, text, speed, voice=TTS_VOICE, model=TTS_MODEL):
+    """
+    Seslendirilen parçaların dosya yollarını sırayla, hazır oldukça verir.
+    Tüm metnin sesi önbellekteyse tek dosya verilir. Parçalar bitince
+    birleşik ses tüm metnin anahtarıyla önbelleğe yazılır; bir sonraki
+    dinleme (ve ön üretim) tek dosyayı kullanır.
+    """
+    key = tts_key(text, speed, voice, model)
+    path = tts_cache.get_path(key, "audio.mp3")
+    if path is not None:
+        yield path
+        return
+    chunks = split_text(text)
+    if len(chunks) == 1:
+        yield synthesize(client, text, speed, voice, model)
+        return
+    # Her parça kendi anahtarıyla önbelleklenir ve eşzamanlı istekler birleşir
+    futures = [_chunk_pool.submit(synthesize, client, chunk, speed, voice, model) for chunk in chunks]
+    paths = []
+    try:
+        for fut in futures:
+            paths.append(fut.result())
+            yield paths[-1]
+    except BaseException:
+        for fut in futures:
+            fut.cancel()
+        raise
+    tts_cache.put_bytes(key, "audio.mp3", join_mp3(paths))
+
+
+# --- DERS YAYINLANINCA ARKA PLANDA ÖN ÜRETİM ---
+_pregen_pool = ThreadPoolExecutor(max_workers=PREGEN_WORKERS, thread_name_prefix="tts-pregen")
+_pregen_job = None
+
+
+class PregenJob:
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.time()
+        self.finished = None if total else self.started
+        self._lock = threading.Lock()
+
+    def _task_done(self, fut):
+        with self._lock:
+            if fut.cancelled() or fut.exception() is not None:
+                self.failed += 1
+            else:
+                self.done += 1
+            if self.done + self.failed >= self.total:
+                self.finished = time.time()
+
+    @property
+    def running(self):
+        return self.finished is None
+
+
+def pregenerate_lesson(client, data, speeds=AUDIO_SPEEDS):
+    """
+    Dersteki her konunun özet ve ek bilgi seslerini tüm hızlarda sınırlı bir
+    işçi havuzunda üretir. Önbellekte olanlar atlanır. İlerleme pregen_status() ile okunur.
+    """
+    global _pregen_job
+    tasks = []
+    for item in data:
+        for text in (item.get('ozet'), item.get('ek_bilgi')):
+            if not text or len(text) < 2:
+                continue
+            for speed in speeds:
+                if cached_audio_path(text, speed) is None:
+                    tasks.append((text, speed))
+
+    job = PregenJob(len(tasks))
+    for text, speed in tasks:
+        fut = _pregen_pool.submit(synthesize, client, text, speed)
+        fut.add_done_callback(job._task_done)
+    _pregen_job = job
+    return job
+
+
+def pregen_status():
+    return _pregen_job